@@ -1,90 +1,770 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, select
-from typing import List, Optional, Type, Any
-from datetime import datetime
-from models.database import SaunaDB, SaunaKashikiriDB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, and_, bindparam, cast, delete, exists, or_, select, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Dict, List, Optional, Set, Tuple, Any
+from datetime import date, datetime, timedelta
+from models.database import (
+    ScrapingState,
+    FacilityDB,
+    KeywordCountDB,
+    KeywordDailyCountDB,
+    KeywordWindowCountDB,
+    SeenReviewDB,
+    RankingSnapshotDB,
+)
 from models.sauna import SaunaBase
+from services.ranking_cache import ranking_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_sauna_by_name(db: Session, name: str) -> Optional[SaunaDB]:
-    return db.query(SaunaDB).filter(SaunaDB.name == name.strip()).first()
+# 1文のINSERTに含める最大行数（SQLiteのバインド変数上限対策）
+UPSERT_CHUNK_SIZE = 500
 
+# 期間別ランキングの集計期間（日数）
+RANKING_WINDOWS_DAYS = (7, 30, 90)
 
-def upsert_sauna(db: Session, sauna: SaunaBase) -> SaunaDB:
-    db_sauna = get_sauna_by_name(db, sauna.name)
+# エクスポート時にサーバーサイドカーソルから1回に取り出す行数
+EXPORT_BATCH_SIZE = 1000
 
-    if db_sauna:
-        db_sauna.review_count += sauna.review_count
-        db_sauna.last_updated = datetime.now()
-    else:
-        db_sauna = SaunaDB(
-            name=sauna.name,
-            url=str(sauna.url),
-            review_count=sauna.review_count,
-            last_updated=datetime.now()
+# ON CONFLICT に対応したINSERT文を作る関数（方言ごと）
+_DIALECT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+def aggregate_by_url(saunas: List[SaunaBase]) -> List[Dict[str, Any]]:
+    """
+    同一URLのサウナをまとめて、review_countを合算した行のリストを返す
+
+    ON CONFLICT は同じ文の中で同じキーを2回更新できないため、書き込み前にまとめておく
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for sauna in saunas:
+        # HttpUrl型を文字列に変換
+        url_str = str(sauna.url)
+        row = rows.get(url_str)
+        if row:
+            row["review_count"] += sauna.review_count
+            row["last_updated"] = max(row["last_updated"], sauna.last_updated)
+        else:
+            rows[url_str] = {
+                "name": sauna.name,
+                "url": url_str,
+                "review_count": sauna.review_count,
+                "last_updated": sauna.last_updated,
+            }
+    return list(rows.values())
+
+
+# ---- キーワード別レビュー数（facilities / keyword_counts） ----
+
+def _insert_for(dialect_name: str):
+    insert_fn = _DIALECT_INSERTS.get(dialect_name)
+    if insert_fn is None:
+        raise ValueError(f"未対応のデータベースです: {dialect_name}")
+    return insert_fn
+
+
+def _facility_upsert_statement(dialect_name: str, rows: List[Dict[str, Any]]):
+    """施設をURLで追加または更新し、(id, url) を返すINSERT文"""
+    insert_fn = _insert_for(dialect_name)
+    stmt = insert_fn(FacilityDB).values([
+        {"name": row["name"], "url": row["url"], "last_updated": row["last_updated"]}
+        for row in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FacilityDB.url],
+        set_={
+            "name": stmt.excluded.name,
+            "last_updated": stmt.excluded.last_updated,
+        },
+    )
+    return stmt.returning(FacilityDB.id, FacilityDB.url)
+
+
+def _keyword_count_upsert_statement(dialect_name: str, count_rows: List[Dict[str, Any]]):
+    """(keyword, facility_id) ごとにreview_countを加算するINSERT文"""
+    insert_fn = _insert_for(dialect_name)
+    stmt = insert_fn(KeywordCountDB).values(count_rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[KeywordCountDB.keyword, KeywordCountDB.facility_id],
+        set_={
+            "review_count": KeywordCountDB.review_count + stmt.excluded.review_count,
+            "last_updated": stmt.excluded.last_updated,
+        },
+    )
+
+
+def _count_increment_statements(dialect_name: str, count_rows: List[Dict[str, Any]], day: date) -> List[Any]:
+    """
+    レビュー数の増分を、累計・日別・直近N日間の各テーブルに加算するINSERT文のリスト
+    """
+    insert_fn = _insert_for(dialect_name)
+
+    daily_stmt = insert_fn(KeywordDailyCountDB).values([
+        {"keyword": row["keyword"], "facility_id": row["facility_id"], "day": day, "review_count": row["review_count"]}
+        for row in count_rows
+    ])
+    daily_stmt = daily_stmt.on_conflict_do_update(
+        index_elements=[KeywordDailyCountDB.keyword, KeywordDailyCountDB.facility_id, KeywordDailyCountDB.day],
+        set_={"review_count": KeywordDailyCountDB.review_count + daily_stmt.excluded.review_count},
+    )
+
+    window_stmt = insert_fn(KeywordWindowCountDB).values([
+        {"keyword": row["keyword"], "window_days": window_days, "facility_id": row["facility_id"], "review_count": row["review_count"]}
+        for row in count_rows
+        for window_days in RANKING_WINDOWS_DAYS
+    ])
+    window_stmt = window_stmt.on_conflict_do_update(
+        index_elements=[KeywordWindowCountDB.keyword, KeywordWindowCountDB.window_days, KeywordWindowCountDB.facility_id],
+        set_={"review_count": KeywordWindowCountDB.review_count + window_stmt.excluded.review_count},
+    )
+
+    return [_keyword_count_upsert_statement(dialect_name, count_rows), daily_stmt, window_stmt]
+
+
+def _counts_version_key(keyword: str) -> str:
+    """キーワードのレビュー数の版を保存するScrapingStateのキー"""
+    return f"counts_version:{keyword}"
+
+
+def _snapshot_version_key(keyword: str) -> str:
+    """スナップショットを作ったときのレビュー数の版を保存するScrapingStateのキー"""
+    return f"snapshot_version:{keyword}"
+
+
+def _bump_counts_version_statement(dialect_name: str, keyword: str):
+    """
+    キーワードのレビュー数の版を1つ進めるINSERT文
+
+    レビュー数の加算と同じトランザクションで実行するので、版はコミットされた加算の回数と一致する
+    """
+    insert_fn = _insert_for(dialect_name)
+    stmt = insert_fn(ScrapingState).values(key=_counts_version_key(keyword), value=1)
+    return stmt.on_conflict_do_update(
+        index_elements=[ScrapingState.key],
+        set_={"value": ScrapingState.value + 1},
+    )
+
+
+def _set_state_statement(dialect_name: str, key: str, value: int):
+    """ScrapingStateの値を追加または上書きするINSERT文"""
+    insert_fn = _insert_for(dialect_name)
+    stmt = insert_fn(ScrapingState).values(key=key, value=value)
+    return stmt.on_conflict_do_update(
+        index_elements=[ScrapingState.key],
+        set_={"value": stmt.excluded.value},
+    )
+
+
+def _counts_version_query(keyword: str):
+    return select(ScrapingState.value).where(ScrapingState.key == _counts_version_key(keyword))
+
+
+def _seen_review_insert_statement(dialect_name: str, keyword: str, review_ids: List[str]):
+    """未登録のレビューIDだけを記録し、記録できたIDを返すINSERT文"""
+    insert_fn = _insert_for(dialect_name)
+    stmt = insert_fn(SeenReviewDB).values([
+        {"keyword": keyword, "review_id": review_id} for review_id in review_ids
+    ])
+    stmt = stmt.on_conflict_do_nothing(index_elements=[SeenReviewDB.keyword, SeenReviewDB.review_id])
+    return stmt.returning(SeenReviewDB.review_id)
+
+
+def _review_ids(saunas: List[SaunaBase]) -> List[str]:
+    # 同じレビューがバッチ内に重複していても1回だけ記録する
+    return list(dict.fromkeys(sauna.review_id for sauna in saunas if sauna.review_id))
+
+
+def _keep_unseen(saunas: List[SaunaBase], new_review_ids: Set[str]) -> List[SaunaBase]:
+    """
+    今回初めて記録したレビューだけを残す
+
+    レビューIDが取れなかったカードは重複を判定できないため、従来どおり数える
+    """
+    unseen = []
+    for sauna in saunas:
+        if sauna.review_id is None:
+            unseen.append(sauna)
+        elif sauna.review_id in new_review_ids:
+            unseen.append(sauna)
+            new_review_ids.discard(sauna.review_id)
+    return unseen
+
+
+def _to_count_rows(keyword: str, rows: List[Dict[str, Any]], facility_ids: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "keyword": keyword,
+            "facility_id": facility_ids[row["url"]],
+            "review_count": row["review_count"],
+            "last_updated": row["last_updated"],
+        }
+        for row in rows
+    ]
+
+
+def _with_facility(count_rows: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """加算した行に施設名とURLを付ける（アーカイブなどDBの外でも施設を特定できるように）"""
+    return [{**count_row, "name": row["name"], "url": row["url"]} for count_row, row in zip(count_rows, rows)]
+
+
+# キーセットページングのカーソル（前のページの最後の行の (review_count, facility_id)）
+RankingCursor = Tuple[int, int]
+
+
+def _after_cursor(count_column, id_column, after: RankingCursor):
+    """(review_count DESC, facility_id ASC) の順でカーソルより後ろの行に絞る条件"""
+    review_count, facility_id = after
+    # review_count <= c を先に置き、インデックスの範囲検索で読み始め位置まで飛ばす
+    return and_(
+        count_column <= review_count,
+        or_(count_column < review_count, id_column > facility_id)
+    )
+
+
+def _window_ranking_query(keyword: str, window_days: int, limit: int, after: Optional[RankingCursor] = None):
+    stmt = select(
+            FacilityDB.id,
+            FacilityDB.name,
+            FacilityDB.url,
+            KeywordWindowCountDB.review_count,
+            FacilityDB.last_updated,
+            FacilityDB.total_review_count
+        )\
+        .join(FacilityDB, FacilityDB.id == KeywordWindowCountDB.facility_id)\
+        .where(
+            KeywordWindowCountDB.keyword == keyword,
+            KeywordWindowCountDB.window_days == window_days,
+            KeywordWindowCountDB.review_count > 0
         )
-        db.add(db_sauna)
-    
-    return db_sauna
+    if after:
+        stmt = stmt.where(_after_cursor(KeywordWindowCountDB.review_count, KeywordWindowCountDB.facility_id, after))
+    return stmt.order_by(KeywordWindowCountDB.review_count.desc(), KeywordWindowCountDB.facility_id).limit(limit)
+
+
+def iter_keyword_export_rows(db: Session, keyword: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    キーワードの全施設のレビュー数をレビュー数の多い順に1行ずつ返すジェネレーター
+
+    yield_perでサーバーサイドカーソルからbatch_size行ずつ取り出すので、
+    行数に関わらずメモリに載るのは1バッチ分だけ（ORMオブジェクトも作らない）
+    """
+    stmt = select(
+            FacilityDB.id.label("facility_id"),
+            FacilityDB.name,
+            FacilityDB.url,
+            KeywordCountDB.review_count,
+            FacilityDB.total_review_count,
+            KeywordCountDB.last_updated
+        )\
+        .join(FacilityDB, FacilityDB.id == KeywordCountDB.facility_id)\
+        .where(KeywordCountDB.keyword == keyword)\
+        .order_by(KeywordCountDB.review_count.desc(), KeywordCountDB.facility_id)\
+        .execution_options(yield_per=batch_size)
+    for row in db.execute(stmt):
+        yield row
 
 
-def bulk_upsert_saunas(db: Session, saunas: List[SaunaBase], db_model: Type[Any] = SaunaDB) -> List[Any]:
+def replace_keyword_counts(
+    db: Session,
+    keyword: str,
+    rows: List[Dict[str, Any]],
+    daily_rows: List[Dict[str, Any]],
+    window_rows: List[Dict[str, Any]]
+) -> int:
     """
-    複数のサウナ情報をまとめて追加または更新
-    
+    キーワードの累計・日別・期間別のレビュー数を、再集計した値で置き換える（コミットは呼び出し側で行う）
+
+    ランキングの再構築用。加算ではなく削除してから挿入するので、膨らんだレビュー数も元に戻る。
+    施設はURLで追加または更新する。
+
     Args:
         db: データベースセッション
+        keyword: キーワードのslug
+        rows: 施設ごとの累計 (url, name, review_count, last_updated)
+        daily_rows: 施設・日ごとの増分 (url, day, review_count)
+        window_rows: 施設・期間ごとの合計 (url, window_days, review_count)
+
+    Returns:
+        int: 置き換えた累計の行数
+    """
+    dialect_name = db.get_bind().dialect.name
+    facility_ids: Dict[str, int] = {}
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        result = db.execute(_facility_upsert_statement(dialect_name, rows[i:i + UPSERT_CHUNK_SIZE]))
+        facility_ids.update({url: facility_id for facility_id, url in result})
+
+    for model in (KeywordCountDB, KeywordDailyCountDB, KeywordWindowCountDB):
+        db.execute(delete(model).where(model.keyword == keyword))
+
+    for model, model_rows, columns in [
+        (KeywordCountDB, rows, ("review_count", "last_updated")),
+        (KeywordDailyCountDB, daily_rows, ("day", "review_count")),
+        (KeywordWindowCountDB, window_rows, ("window_days", "review_count")),
+    ]:
+        values = [
+            {"keyword": keyword, "facility_id": facility_ids[row["url"]], **{column: row[column] for column in columns}}
+            for row in model_rows
+        ]
+        for i in range(0, len(values), UPSERT_CHUNK_SIZE):
+            db.execute(model.__table__.insert(), values[i:i + UPSERT_CHUNK_SIZE])
+    db.execute(_bump_counts_version_statement(dialect_name, keyword))
+    return len(rows)
+
+
+def _snapshot_source_queries(keyword: str):
+    """スナップショットの作り直しに使う、前回の順位と現在のレビュー数順の施設を取得するクエリ"""
+    previous = select(RankingSnapshotDB.facility_id, RankingSnapshotDB.rank)\
+        .where(RankingSnapshotDB.keyword == keyword)
+    ranked = select(KeywordCountDB.facility_id, KeywordCountDB.review_count, KeywordCountDB.last_updated)\
+        .where(KeywordCountDB.keyword == keyword, KeywordCountDB.review_count > 0)\
+        .order_by(KeywordCountDB.review_count.desc(), KeywordCountDB.facility_id)
+    return previous, ranked
+
+
+def _ranking_snapshot_rows(keyword: str, ranked: List[Any], previous_ranks: Dict[int, int]) -> List[Dict[str, Any]]:
+    """現在の並び順に1から順位を振り、前回の順位との差分を付ける"""
+    snapshot_at = datetime.now()
+    rows = []
+    for rank, (facility_id, review_count, last_updated) in enumerate(ranked, start=1):
+        previous_rank = previous_ranks.get(facility_id)
+        rows.append({
+            "keyword": keyword,
+            "rank": rank,
+            "facility_id": facility_id,
+            "review_count": review_count,
+            "last_updated": last_updated,
+            "previous_rank": previous_rank,
+            "rank_delta": previous_rank - rank if previous_rank is not None else None,
+            "snapshot_at": snapshot_at,
+        })
+    return rows
+
+
+def refresh_ranking_snapshot(db: Session, keyword: str, commit: bool = True) -> int:
+    """
+    キーワードの累計ランキングのスナップショットを作り直す
+
+    Returns:
+        int: スナップショットの行数
+    """
+    dialect_name = db.get_bind().dialect.name
+    previous, ranked = _snapshot_source_queries(keyword)
+    counts_version = db.scalar(_counts_version_query(keyword)) or 0
+    previous_ranks = dict(db.execute(previous).all())
+    rows = _ranking_snapshot_rows(keyword, db.execute(ranked).all(), previous_ranks)
+    db.execute(delete(RankingSnapshotDB).where(RankingSnapshotDB.keyword == keyword))
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        db.execute(RankingSnapshotDB.__table__.insert(), rows[i:i + UPSERT_CHUNK_SIZE])
+    db.execute(_set_state_statement(dialect_name, _snapshot_version_key(keyword), counts_version))
+    if commit:
+        db.commit()
+        ranking_cache.invalidate(keyword)
+    return len(rows)
+
+
+def _snapshot_ranking_query(keyword: str, limit: int, after_rank: Optional[int] = None):
+    stmt = select(
+            FacilityDB.id,
+            FacilityDB.name,
+            FacilityDB.url,
+            RankingSnapshotDB.rank,
+            RankingSnapshotDB.previous_rank,
+            RankingSnapshotDB.rank_delta,
+            RankingSnapshotDB.review_count,
+            RankingSnapshotDB.last_updated,
+            FacilityDB.total_review_count,
+            (cast(RankingSnapshotDB.review_count, Float) / func.nullif(FacilityDB.total_review_count, 0)).label("keyword_ratio")
+        )\
+        .join(FacilityDB, FacilityDB.id == RankingSnapshotDB.facility_id)\
+        .where(RankingSnapshotDB.keyword == keyword)
+    if after_rank:
+        stmt = stmt.where(RankingSnapshotDB.rank > after_rank)
+    # 主キー (keyword, rank) の順に読むだけなので並べ替えは発生しない
+    return stmt.order_by(RankingSnapshotDB.rank).limit(limit)
+
+
+# ---- 非同期セッション用 ----
+
+async def get_scraping_state_async(db: AsyncSession, key: str) -> Optional[ScrapingState]:
+    """ScrapingStateをキーで取得する"""
+    stmt = select(ScrapingState).where(ScrapingState.key == key)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def get_scraping_state_values_async(db: AsyncSession, keys: List[str]) -> Dict[str, int]:
+    """複数のScrapingStateの値を1回のクエリで取得する（存在しないキーは含まない）"""
+    stmt = select(ScrapingState.key, ScrapingState.value).where(ScrapingState.key.in_(keys))
+    return {key: value for key, value in await db.execute(stmt)}
+
+
+def keyword_cursor_filter(key_prefix: str):
+    """キーワードの全都道府県のページカーソル（key_prefix と f"{key_prefix}:{都道府県}"）に当てはまる条件"""
+    return or_(
+        ScrapingState.key == key_prefix,
+        ScrapingState.key.startswith(f"{key_prefix}:", autoescape=True)
+    )
+
+
+async def reset_keyword_cursors_async(db: AsyncSession, key_prefix: str) -> int:
+    """
+    キーワードの全都道府県のページカーソルを1ページ目に戻す
+
+    Returns:
+        int: 戻したカーソルの数
+    """
+    result = await db.execute(update(ScrapingState).where(keyword_cursor_filter(key_prefix)).values(value=1))
+    reset_count = result.rowcount
+    if not await get_scraping_state_async(db, key_prefix):
+        db.add(ScrapingState(key=key_prefix, value=1))
+        reset_count += 1
+    await db.commit()
+    return reset_count
+
+
+async def set_scraping_state_async(db: AsyncSession, key: str, value: int, commit: bool = True) -> ScrapingState:
+    """ScrapingStateを追加または更新する"""
+    state = await get_scraping_state_async(db, key)
+    if state:
+        state.value = value
+    else:
+        state = ScrapingState(key=key, value=value)
+        db.add(state)
+
+    if commit:
+        await db.commit()
+    return state
+
+
+async def filter_unseen_reviews_async(db: AsyncSession, keyword: str, saunas: List[SaunaBase]) -> List[SaunaBase]:
+    """
+    集計済みのレビューを取り除き、残りをseen_reviewsに記録する（コミットは呼び出し側で行う）
+
+    レビュー数の加算と同じトランザクションで実行するため、
+    同じページを再クロールしたり、クロールが重なったりしても二重に数えない
+    """
+    review_ids = _review_ids(saunas)
+    dialect_name = db.bind.dialect.name
+    new_review_ids = set()
+    for i in range(0, len(review_ids), UPSERT_CHUNK_SIZE):
+        result = await db.execute(_seen_review_insert_statement(dialect_name, keyword, review_ids[i:i + UPSERT_CHUNK_SIZE]))
+        new_review_ids.update(result.scalars())
+    return _keep_unseen(saunas, new_review_ids)
+
+
+async def _add_keyword_counts_async(db: AsyncSession, keyword: str, saunas: List[SaunaBase]) -> List[Dict[str, Any]]:
+    """集計済みかどうかを確認せずにレビュー数を加算する（コミットは呼び出し側で行う）"""
+    rows = aggregate_by_url(saunas)
+    if not rows:
+        return []
+
+    dialect_name = db.bind.dialect.name
+    saved_rows = []
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+        result = await db.execute(_facility_upsert_statement(dialect_name, chunk))
+        facility_ids = {url: facility_id for facility_id, url in result}
+        count_rows = _to_count_rows(keyword, chunk, facility_ids)
+        for stmt in _count_increment_statements(dialect_name, count_rows, date.today()):
+            await db.execute(stmt)
+        saved_rows.extend(_with_facility(count_rows, chunk))
+    await db.execute(_bump_counts_version_statement(dialect_name, keyword))
+    return saved_rows
+
+
+async def upsert_keyword_counts_async(
+    db: AsyncSession,
+    keyword: str,
+    saunas: List[SaunaBase],
+    commit: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    キーワードのレビュー数をまとめて加算する
+
+    集計済みのレビューを除いてから同一URLをメモリ上で合算し、施設の追加・更新と
+    レビュー数の加算をそれぞれ INSERT ... ON CONFLICT の1文（大きなバッチはチャンクごと）で行う
+
+    Args:
+        db: 非同期データベースセッション
+        keyword: キーワードのslug（例: "anaba"）
         saunas: 保存するサウナ情報のリスト
-        db_model: 保存先のモデルクラス（デフォルトはSaunaDB）
-        
+        commit: Falseの場合はコミットせず、呼び出し側のトランザクションに含める
+
     Returns:
-        List: 保存されたレコードのリスト
+        List[Dict]: 加算した (keyword, facility_id, review_count, last_updated, name, url) のリスト
     """
     try:
-        updated_saunas = []
-        
-        for sauna in saunas:
-            # HttpUrl型を文字列に変換
-            url_str = str(sauna.url)
-            
-            # 既存のレコードを検索（文字列で検索）
-            stmt = select(db_model).where(db_model.url == url_str)
-            existing = db.execute(stmt).scalar_one_or_none()
-            
-            if existing:
-                # 既存レコードの更新
-                existing.review_count += sauna.review_count
-                existing.last_updated = sauna.last_updated
-                db_sauna = existing
-            else:
-                # 新規レコードの作成（文字列としてURLを保存）
-                db_sauna = db_model(
-                    name=sauna.name,
-                    url=url_str,  # 文字列に変換
-                    review_count=sauna.review_count,
-                    last_updated=sauna.last_updated
-                )
-                db.add(db_sauna)
-            
-            updated_saunas.append(db_sauna)
-            db.flush()
-
-        # 全ての処理が成功したらコミット
-        db.commit()
-        return updated_saunas
+        unseen = await filter_unseen_reviews_async(db, keyword, saunas)
+        saved_rows = await _add_keyword_counts_async(db, keyword, unseen)
+
+        if commit:
+            await db.commit()
+            ranking_cache.invalidate(keyword)
+        return saved_rows
 
     except Exception as e:
         logger.error(f"一括保存中にエラーが発生: {e}")
-        db.rollback()
+        await db.rollback()
+        raise
+
+
+async def save_page_batch_async(
+    db: AsyncSession,
+    keyword: str,
+    saunas: List[SaunaBase],
+    next_page: int,
+    key_prefix: str
+) -> List[Dict[str, Any]]:
+    """
+    1ページ分のレビュー数と次回の開始ページを同じトランザクションで保存する
+
+    途中で失敗してもカーソルだけが進むことはなく、次回は保存できなかったページから再開する
+
+    Args:
+        db: 非同期データベースセッション
+        keyword: キーワードのslug
+        saunas: 1ページ分のサウナ情報
+        next_page: このページを保存した後の次回開始ページ
+        key_prefix: ScrapingStateのキー
+
+    Returns:
+        List[Dict]: 加算した行のリスト
+    """
+    try:
+        saved_rows = await upsert_keyword_counts_async(db, keyword, saunas, commit=False)
+        await set_scraping_state_async(db, key_prefix, next_page, commit=False)
+
+        await db.commit()
+        ranking_cache.invalidate(keyword)
+        return saved_rows
+
+    except Exception as e:
+        logger.error(f"ページの保存中にエラーが発生: {e}")
+        await db.rollback()
+        raise
+
+
+async def save_incremental_page_async(
+    db: AsyncSession,
+    keyword: str,
+    saunas: List[SaunaBase]
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    新着順の1ページ分を保存し、集計済みのレビューに到達したかどうかを返す
+
+    新着順のページでは集計済みのレビューより後ろは全て集計済みなので、
+    呼び出し側はTrueが返ったところでクロールを終了できる
+
+    Returns:
+        Tuple[List[Dict], bool]: 加算した行のリストと、集計済みのレビューを含んでいたか
+    """
+    try:
+        unseen = await filter_unseen_reviews_async(db, keyword, saunas)
+        saved_rows = await _add_keyword_counts_async(db, keyword, unseen)
+
+        await db.commit()
+        ranking_cache.invalidate(keyword)
+        return saved_rows, len(unseen) < len(saunas)
+
+    except Exception as e:
+        logger.error(f"ページの保存中にエラーが発生: {e}")
+        await db.rollback()
+        raise
+
+
+async def get_window_ranking_async(
+    db: AsyncSession,
+    keyword: str,
+    window_days: int,
+    limit: int = 50,
+    after: Optional[RankingCursor] = None
+) -> List[Any]:
+    """
+    直近window_days日間のレビュー数の多い順に施設をランキング取得（ロールアップテーブルから読む）
+
+    afterを指定すると、その行の続きからlimit件を返す（キーセットページング）。
+    OFFSETを使わないため、何ページ目でも1ページ目と同じコストで取得できる。
+    """
+    if window_days not in RANKING_WINDOWS_DAYS:
+        raise ValueError(f"未対応の集計期間です: {window_days}")
+    return (await db.execute(_window_ranking_query(keyword, window_days, limit, after))).all()
+
+
+async def get_snapshot_ranking_async(
+    db: AsyncSession,
+    keyword: str,
+    limit: int = 50,
+    after_rank: Optional[int] = None
+) -> List[Any]:
+    """
+    累計ランキングのスナップショットを順位順に取得（順位・前回の順位・順位の変動を含む）
+
+    after_rankを指定すると、その順位より後ろのlimit件を返す（キーセットページング）
+    """
+    return (await db.execute(_snapshot_ranking_query(keyword, limit, after_rank))).all()
+
+
+async def ranking_snapshot_is_stale_async(db: AsyncSession, keyword: str) -> bool:
+    """
+    スナップショットを作った後にキーワードのレビュー数が加算されたかどうか
+
+    クロールが途中で失敗してスナップショットを作り直せなかった場合も、次のクロールで検出できる。
+    last_updated（パースした時刻）ではなく、加算と同じトランザクションで進めるレビュー数の版と、
+    スナップショットを作る前に読んだ版を比べるので、作り直しと並行してコミットされた加算も取りこぼさない。
+    """
+    counts_key, snapshot_key = _counts_version_key(keyword), _snapshot_version_key(keyword)
+    versions = await get_scraping_state_values_async(db, [counts_key, snapshot_key])
+    return versions.get(counts_key, 0) > versions.get(snapshot_key, 0)
+
+
+async def refresh_ranking_snapshot_async(db: AsyncSession, keyword: str) -> int:
+    """
+    キーワードの累計ランキングのスナップショットを作り直す（非同期版）
+
+    クロールの取り込みが終わった後に1回だけ呼ぶ。前回のスナップショットの順位をprevious_rankに残すので、
+    rank_deltaは前回のクロールからの順位の変動になる。
+    読み込み側は入れ替え前か後のどちらか一方だけを見るよう、削除と挿入を1つのトランザクションで行う。
+
+    Returns:
+        int: スナップショットの行数
+    """
+    dialect_name = db.bind.dialect.name
+    previous, ranked = _snapshot_source_queries(keyword)
+    try:
+        # 集計より先に版を読む（間にコミットされた加算は、次の確認で作り直しの対象になる）
+        counts_version = await db.scalar(_counts_version_query(keyword)) or 0
+        previous_ranks = dict((await db.execute(previous)).all())
+        rows = _ranking_snapshot_rows(keyword, (await db.execute(ranked)).all(), previous_ranks)
+        await db.execute(delete(RankingSnapshotDB).where(RankingSnapshotDB.keyword == keyword))
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            await db.execute(RankingSnapshotDB.__table__.insert(), rows[i:i + UPSERT_CHUNK_SIZE])
+        await db.execute(_set_state_statement(dialect_name, _snapshot_version_key(keyword), counts_version))
+
+        await db.commit()
+        ranking_cache.invalidate(keyword)
+        logger.info(f"ランキングのスナップショットを更新しました（keyword={keyword}, {len(rows)}件）")
+        return len(rows)
+
+    except Exception as e:
+        logger.error(f"スナップショットの更新中にエラーが発生: {e}")
+        await db.rollback()
+        raise
+
+
+def _expire_window_day_statements(window_days: int, day: date) -> List[Any]:
+    """直近window_days日間のロールアップから、期間外になった日（day）の増分を差し引く文"""
+    window = KeywordWindowCountDB.__table__
+    daily = KeywordDailyCountDB.__table__
+    day_filter = and_(
+        daily.c.keyword == window.c.keyword,
+        daily.c.facility_id == window.c.facility_id,
+        daily.c.day == day
+    )
+    subtract = update(window)\
+        .where(window.c.window_days == window_days, exists().where(day_filter))\
+        .values(review_count=window.c.review_count - select(daily.c.review_count).where(day_filter).scalar_subquery())
+    cleanup = delete(window).where(window.c.window_days == window_days, window.c.review_count <= 0)
+    return [subtract, cleanup]
+
+
+async def roll_window_counts_async(db: AsyncSession, today: Optional[date] = None) -> int:
+    """
+    直近N日間のロールアップを今日の日付まで進める
+
+    前回進めた日（ScrapingStateの "rollup:{日数}"、日付の序数）の翌日から今日までの各日について、
+    期間外になった日の日別増分だけを差し引くので、履歴全体を集計し直すことはない。
+    最長の期間より古い日別の増分は削除する。
+
+    Returns:
+        int: 進めた日数（期間ごとの合計）
+    """
+    today = today or date.today()
+    rolled_days = 0
+    try:
+        for window_days in RANKING_WINDOWS_DAYS:
+            state_key = f"rollup:{window_days}"
+            state = await get_scraping_state_async(db, state_key)
+            # 初回は今日を起点にする（日別の増分はこの機能の導入時から記録されるため）
+            last_rolled = date.fromordinal(state.value) if state else today
+            day = last_rolled + timedelta(days=1)
+            while day <= today:
+                for stmt in _expire_window_day_statements(window_days, day - timedelta(days=window_days)):
+                    await db.execute(stmt)
+                rolled_days += 1
+                day += timedelta(days=1)
+            if state is None or last_rolled < today:
+                await set_scraping_state_async(db, state_key, today.toordinal(), commit=False)
+
+        oldest_day = today - timedelta(days=max(RANKING_WINDOWS_DAYS))
+        await db.execute(delete(KeywordDailyCountDB).where(KeywordDailyCountDB.day <= oldest_day))
+        await db.commit()
+        if rolled_days:
+            ranking_cache.invalidate()
+        return rolled_days
+
+    except Exception as e:
+        logger.error(f"期間別ランキングの更新中にエラーが発生: {e}")
+        await db.rollback()
         raise
 
-def get_sauna_ranking(db: Session, limit: int = 50, db_model: Type[Any] = SaunaDB) -> List[Any]:
+
+async def count_keyword_facilities_async(db: AsyncSession, keyword: str) -> int:
+    """キーワードのレビューがある施設の数"""
+    stmt = select(func.count()).select_from(KeywordCountDB).where(KeywordCountDB.keyword == keyword)
+    return await db.scalar(stmt)
+
+
+async def get_facilities_to_enrich_async(db: AsyncSession, stale_before: datetime, limit: int) -> List[Any]:
     """
-    レビュー数の多い順にサウナをランキング取得
+    詳細ページの総レビュー数を取得する施設を返す
+
+    未取得の施設と、stale_beforeより前に取得してからレビューが増えた（last_updatedが新しい）施設が対象。
+    未取得の施設を優先する。
+    """
+    enriched_at = FacilityDB.total_review_count_updated_at
+    stmt = select(FacilityDB.id, FacilityDB.url)\
+        .where(or_(
+            enriched_at.is_(None),
+            and_(enriched_at < stale_before, FacilityDB.last_updated > enriched_at)
+        ))\
+        .order_by(enriched_at.is_not(None), FacilityDB.last_updated.desc())\
+        .limit(limit)
+    return (await db.execute(stmt)).all()
+
+
+async def set_total_review_counts_async(db: AsyncSession, counts: Dict[int, Optional[int]]) -> int:
+    """
+    施設ごとの総レビュー数と取得日時をまとめて更新する
+
+    last_updated（施設にレビューが増えた日時）は変更しない
     """
-    return db.query(db_model)\
-        .order_by(db_model.review_count.desc())\
-        .limit(limit)\
-        .all() 
\ No newline at end of file
+    if not counts:
+        return 0
+
+    facilities = FacilityDB.__table__
+    stmt = update(facilities)\
+        .where(facilities.c.id == bindparam("facility_id"))\
+        .values(
+            total_review_count=bindparam("total_review_count"),
+            total_review_count_updated_at=bindparam("updated_at"),
+            last_updated=facilities.c.last_updated
+        )
+    now = datetime.now()
+    try:
+        await db.execute(stmt, [
+            {"facility_id": facility_id, "total_review_count": count, "updated_at": now}
+            for facility_id, count in counts.items()
+        ])
+        await db.commit()
+        # 全キーワードのランキングに総レビュー数が含まれるため、全て破棄する
+        ranking_cache.invalidate()
+        return len(counts)
+
+    except Exception as e:
+        logger.error(f"総レビュー数の保存中にエラーが発生: {e}")
+        await db.rollback()
+        raise
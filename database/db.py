@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -23,12 +25,97 @@ print(f"✅ DATABASE_URL in use: {DATABASE_URL}")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+def build_engine_options(database_url: str) -> dict:
+    """
+    環境変数から接続プールの設定を組み立てる
+
+    DB_ECHO: SQLログを出力するか（デフォルト: false）
+    DB_POOL_PRE_PING: 接続を使う前に生存確認するか（デフォルト: true）
+    DB_POOL_RECYCLE: 接続を作り直すまでの秒数（デフォルト: 300）
+    DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT: プールの大きさと待ち時間
+    DB_STATEMENT_TIMEOUT_MS: 1文あたりのタイムアウト（PostgreSQLのみ、0で無効）
+    """
+    options = {
+        "echo": _env_bool("DB_ECHO", False),
+        # Renderではアイドル中に接続が切られるため、使う前に確認して張り直す
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 300),
+    }
+
+    if database_url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 5),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+    )
+    statement_timeout_ms = _env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+    if statement_timeout_ms > 0 and database_url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
 # エンジンの作成
-engine = create_engine(DATABASE_URL, echo=True)  # SQLログを出力
+engine = create_engine(DATABASE_URL, **build_engine_options(DATABASE_URL))
 
 # セッションローカルの作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(database_url: str) -> str:
+    """
+    同期用の接続URLを非同期ドライバー用に変換する
+
+    postgresql:// → postgresql+asyncpg://、sqlite:// → sqlite+aiosqlite://
+    asyncpgはsslmodeパラメータを受け付けないため、URLからは取り除く（SSLはconnect_argsで指定）
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"])
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+def build_async_engine_options(database_url: str) -> dict:
+    """非同期エンジン用の接続プール設定（環境変数は同期エンジンと共通）"""
+    options = {
+        "echo": _env_bool("DB_ECHO", False),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 300),
+    }
+
+    if database_url.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 5),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+    )
+    connect_args = {}
+    statement_timeout_ms = _env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+    if statement_timeout_ms > 0:
+        connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+    sslmode = make_url(database_url).query.get("sslmode")
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+# 非同期エンジンの作成（asyncpg / aiosqlite）
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **build_async_engine_options(DATABASE_URL))
+
+# 非同期セッションの作成（コミット後も属性を読めるようexpire_on_commit=False）
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # モデルのベースクラス
 Base = declarative_base()
 
@@ -51,27 +138,43 @@ def get_db():
     finally:
         db.close()
 
-def init_db():
+async def get_async_db():
     """
-    データベースの初期化（テーブルの作成）を行う
-    
-    注意: この関数はアプリケーション起動時に一度だけ実行する
+    FastAPIのDependencyとして使用する非同期データベースセッションを提供する
+
+    Yields:
+        AsyncSession: 非同期データベースセッション
+
+    Example:
+        @app.get("/items/")
+        async def read_items(db: AsyncSession = Depends(get_async_db)):
+            items = await crud.get_items_async(db)
+            return items
     """
-    try:
-        from models.database import SaunaDB  # noqa
-
-        # テーブルが存在するか確認
-        inspector = inspect(engine)
-        if not inspector.has_table("saunas"):
-            logger.info("saunasテーブルが存在しないため、作成を開始します")
-            # モデルのインポート（循環インポートを避けるため、ここで行う）
-            
-            # テーブルの作成
-            Base.metadata.create_all(bind=engine)
-            logger.info("テーブルの作成が完了しました")
-        else:
-            logger.info("saunasテーブルは既に存在します")
-            
-    except Exception as e:
-        logger.error(f"テーブルの作成中にエラーが発生しました: {e}")
-        raise 
\ No newline at end of file
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _pool_stats(pool) -> dict:
+    status = {
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+def get_pool_status() -> dict:
+    """
+    同期・非同期それぞれのエンジンの接続プールの利用状況を返す
+
+    取り込みやAPIのほとんどは非同期エンジンを使うので、貸出中の接続数は主に "async" 側に出る
+
+    Returns:
+        dict: "sync" / "async" ごとのプールの種類・サイズ・貸出中/待機中の接続数など
+    """
+    return {
+        "sync": _pool_stats(engine.pool),
+        "async": _pool_stats(async_engine.pool),
+    }
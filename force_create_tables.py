@@ -2,12 +2,54 @@
 from sqlalchemy import inspect, MetaData, Table, Column, Integer, String, DateTime
 from sqlalchemy.schema import CreateTable
 from sqlalchemy.sql import text
+from sqlalchemy.orm import Session
 from database.db import engine
+from models.database import (
+    Base,
+    FacilityDB,
+    KeywordCountDB,
+    KeywordDailyCountDB,
+    KeywordWindowCountDB,
+    RankingSnapshotDB,
+    ScrapingState,
+    SeenReviewDB,
+)
+from crud import refresh_ranking_snapshot
+from services.keywords import KEYWORDS, KeywordConfig
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def migrate_legacy_table(conn, config: KeywordConfig):
+    """
+    旧テーブルの施設とレビュー数をfacilities / keyword_countsへコピーする
+
+    既にそのキーワードのレビュー数がある場合は何もしない（2回目以降の起動では実行されない）
+    """
+    already_migrated = conn.execute(
+        text("SELECT 1 FROM keyword_counts WHERE keyword = :keyword LIMIT 1"),
+        {"keyword": config.slug}
+    ).first()
+    if already_migrated:
+        return
+
+    # WHERE TRUE はSQLiteで INSERT ... SELECT と ON CONFLICT を併用するために必要
+    conn.execute(text(f"""
+        INSERT INTO facilities (name, url, created_at, last_updated)
+        SELECT name, url, created_at, last_updated FROM {config.legacy_table}
+        WHERE TRUE
+        ON CONFLICT (url) DO NOTHING;
+    """))
+    result = conn.execute(text(f"""
+        INSERT INTO keyword_counts (keyword, facility_id, review_count, last_updated)
+        SELECT :keyword, f.id, s.review_count, s.last_updated
+        FROM {config.legacy_table} s JOIN facilities f ON f.url = s.url
+        WHERE TRUE
+        ON CONFLICT (keyword, facility_id) DO NOTHING;
+    """), {"keyword": config.slug})
+    logger.info(f"{config.legacy_table}から{result.rowcount}件を移行しました（keyword={config.slug}）")
+
 def force_create_tables():
     """強制的にテーブルを作成"""
     try:
@@ -19,49 +61,34 @@ def force_create_tables():
             inspector = inspect(engine)
             existing_tables = inspector.get_table_names()
             
-            # saunasテーブルの作成
-            if 'saunas' not in existing_tables:
-                create_saunas_sql = """
-                CREATE TABLE IF NOT EXISTS saunas (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR NOT NULL,
-                    url VARCHAR UNIQUE NOT NULL,
-                    review_count INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """
-                conn.execute(text(create_saunas_sql))
-                logger.info("saunasテーブルを作成しました")
+            # キーワード別集計のテーブルの作成（全キーワード共通）
+            Base.metadata.create_all(
+                conn,
+                tables=[
+                    FacilityDB.__table__,
+                    KeywordCountDB.__table__,
+                    KeywordDailyCountDB.__table__,
+                    KeywordWindowCountDB.__table__,
+                    SeenReviewDB.__table__,
+                    RankingSnapshotDB.__table__,
+                    ScrapingState.__table__,
+                ]
+            )
+            logger.info("facilities・keyword_counts・keyword_daily_counts・keyword_window_counts・seen_reviews・ranking_snapshots・scraping_stateテーブルを確認しました")
 
-            # saunas_kashikiriテーブルの作成
-            if 'saunas_kashikiri' not in existing_tables:
-                create_kashikiri_sql = """
-                CREATE TABLE IF NOT EXISTS saunas_kashikiri (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR NOT NULL,
-                    url VARCHAR UNIQUE NOT NULL,
-                    review_count INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """
-                conn.execute(text(create_kashikiri_sql))
-                logger.info("saunas_kashikiriテーブルを作成しました")
+            # 既存のfacilitiesテーブルに後から追加した列を追加
+            facility_columns = {column["name"] for column in inspect(conn).get_columns("facilities")}
+            for column_name, column_type in [
+                ("total_review_count", "INTEGER"),
+                ("total_review_count_updated_at", "TIMESTAMP"),
+            ]:
+                if column_name not in facility_columns:
+                    conn.execute(text(f"ALTER TABLE facilities ADD COLUMN {column_name} {column_type}"))
+                    logger.info(f"facilitiesテーブルに{column_name}列を追加しました")
 
-            # scraping_stateテーブルの作成
+            # scraping_stateテーブルを作成したときは初期データを挿入
+            # （テーブルはcreate_allで作るので、SQLiteでもidが自動採番される）
             if 'scraping_state' not in existing_tables:
-                create_state_sql = """
-                CREATE TABLE IF NOT EXISTS scraping_state (
-                    id SERIAL PRIMARY KEY,
-                    key VARCHAR UNIQUE NOT NULL,
-                    value INTEGER NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """
-                conn.execute(text(create_state_sql))
-                
-                # 初期データの挿入
                 init_state_sql = """
                 INSERT INTO scraping_state (key, value)
                 VALUES 
@@ -70,7 +97,22 @@ def force_create_tables():
                 ON CONFLICT (key) DO NOTHING;
                 """
                 conn.execute(text(init_state_sql))
-                logger.info("scraping_stateテーブルを作成し、初期データを挿入しました")
+                logger.info("scraping_stateテーブルに初期データを挿入しました")
+
+            # キーワード別テーブル（saunas / saunas_kashikiri）からの移行
+            for config in KEYWORDS:
+                if config.legacy_table in existing_tables:
+                    migrate_legacy_table(conn, config)
+
+            # スナップショットがまだ無いキーワードは、次のクロールを待たずに作っておく
+            with Session(bind=conn) as session:
+                for config in KEYWORDS:
+                    has_snapshot = session.execute(
+                        text("SELECT 1 FROM ranking_snapshots WHERE keyword = :keyword LIMIT 1"),
+                        {"keyword": config.slug}
+                    ).first()
+                    if not has_snapshot:
+                        refresh_ranking_snapshot(session, config.slug, commit=False)
             
             conn.commit()
             logger.info("全てのテーブル作成が完了しました")
@@ -1,16 +1,15 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from database.db import init_db, engine, get_db, Base
-from models.database import SaunaDB  # 明示的にインポート
+from database.db import engine, get_pool_status, Base
 import logging
 from routers import sauna_ranking
 from force_create_tables import force_create_tables
 from sqlalchemy import inspect
 from sqlalchemy.sql import text
 import time
-from sqlalchemy.orm import Session
-from services.scraper import SaunaScraper
-import crud
+from services.jobs import job_runner
+from services.scheduler import CrawlScheduler, default_crawls
+import os
 
 # ロガーの設定
 logging.basicConfig(level=logging.INFO)
@@ -19,11 +18,11 @@ logger = logging.getLogger(__name__)
 # 🔇 SQLAlchemyのSQLログを抑制（ここを追加！）
 logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
-# スクレイピングのインスタンス作成
-sauna_scraper = SaunaScraper()
-
 app = FastAPI()
 
+# キーワードごとの定期スクレイピング（SCHEDULER_ENABLED=true で有効）
+crawl_scheduler = CrawlScheduler(sauna_ranking.sauna_scraper, job_runner, default_crawls())
+
 # CORSの設定
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +30,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ブラウザのクライアントからキャッシュ検証とページングのヘッダーを読めるようにする
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # アプリケーション起動時にデータベースを初期化
@@ -39,14 +40,25 @@ async def startup_event():
     try:
         logger.info("アプリケーション起動 - データベース初期化チェック")
         inspector = inspect(engine)
-        if 'saunas' not in inspector.get_table_names():
-            logger.info("saunasテーブルが存在しないため作成します")
+        missing_tables = {'keyword_counts', 'ranking_snapshots'} - set(inspector.get_table_names())
+        if missing_tables:
+            logger.info(f"{', '.join(sorted(missing_tables))}テーブルが存在しないため作成します")
             force_create_tables()
         else:
-            logger.info("saunasテーブルは既に存在します")
+            logger.info("keyword_counts・ranking_snapshotsテーブルは既に存在します")
     except Exception as e:
         logger.error(f"起動時の初期化でエラー: {e}")
 
+    if os.getenv("SCHEDULER_ENABLED", "false").lower() == "true":
+        crawl_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # スケジューラーと実行中のジョブを止め、スクレイパーが保持しているkeep-alive接続を閉じる
+    await crawl_scheduler.stop()
+    await job_runner.shutdown()
+    await sauna_ranking.sauna_scraper.aclose()
+
 # サウナランキング関連のルーターを登録
 app.include_router(sauna_ranking.router)
 
@@ -111,6 +123,16 @@ async def debug_database():
             "traceback": traceback.format_exc()
         }
 
+@app.get("/debug-db/pool")
+async def debug_database_pool():
+    """データベース接続プールの統計情報を返す"""
+    return get_pool_status()
+
+@app.get("/api/scheduler")
+async def get_scheduler_status():
+    """定期スクレイピングの状態と次回の実行予定を返す"""
+    return crawl_scheduler.status()
+
 @app.get("/health")
 async def health_check():
     """
@@ -140,43 +162,3 @@ async def health_check():
             status_code=500,
             detail=f"Service unhealthy: {str(e)}"
         )
-
-# スクレイピングエンドポイントにリトライロジックを追加
-@app.get("/api/github-action-scraping")
-async def run_github_action_scraping(db: Session = Depends(get_db)):
-    """
-    GitHub Actionsから呼び出されるスクレイピング実行エンドポイント
-    リトライロジックを含む
-    """
-    max_retries = 3
-    retry_delay = 5  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            # テーブルの存在確認
-            inspector = inspect(engine)
-            if 'saunas' not in inspector.get_table_names():
-                logger.info("saunasテーブルが存在しないため作成します")
-                force_create_tables()
-            
-            # スクレイピングを実行
-            scraped_saunas = sauna_scraper.run_scheduled_scraping()
-            
-            # DBに保存
-            saved_saunas = crud.bulk_upsert_saunas(db, scraped_saunas)
-            
-            return {
-                "message": "Scraping and DB update completed successfully",
-                "count": len(saved_saunas)
-            }
-            
-        except Exception as e:
-            logger.error(f"試行 {attempt + 1}/{max_retries} 失敗: {e}")
-            if attempt < max_retries - 1:
-                logger.info(f"{retry_delay}秒後にリトライします...")
-                time.sleep(retry_delay)
-                continue
-            raise HTTPException(
-                status_code=500,
-                detail=f"All retry attempts failed: {str(e)}"
-            ) 
\ No newline at end of file
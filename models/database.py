@@ -1,30 +1,79 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
-class SaunaDB(Base):
-    """穴場キーワードを含むサウナモデル"""
-    __tablename__ = "saunas"
+class FacilityDB(Base):
+    """サウナ施設モデル（キーワードに依存しない施設情報）"""
+    __tablename__ = "facilities"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True, nullable=False)
+    name = Column(String, nullable=False)
     url = Column(String, unique=True, nullable=False)
-    review_count = Column(Integer, default=0)
+    # 詳細ページから取得した総レビュー（サ活）数と、その取得日時
+    total_review_count = Column(Integer, nullable=True)
+    total_review_count_updated_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
-class SaunaKashikiriDB(Base):
-    """貸切キーワードを含むサウナモデル"""
-    __tablename__ = "saunas_kashikiri"
+class KeywordCountDB(Base):
+    """キーワードごとの施設のレビュー数モデル（キーワードを追加してもテーブルは増えない）"""
+    __tablename__ = "keyword_counts"
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True, nullable=False)
-    url = Column(String, unique=True, nullable=False)
-    review_count = Column(Integer, default=0)
-    created_at = Column(DateTime, server_default=func.now())
+    keyword = Column(String, primary_key=True)  # services.keywords のslug（例: "anaba"/"kashikiri"）
+    facility_id = Column(Integer, ForeignKey("facilities.id", ondelete="CASCADE"), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    # ランキング（keyword指定・review_count降順）をインデックスだけで辿れるようにする
+    __table_args__ = (
+        Index("ix_keyword_counts_ranking", keyword, review_count.desc(), facility_id),
+    )
+
+class KeywordDailyCountDB(Base):
+    """キーワードごと・施設ごとの日別のレビュー数の増分（集計した日で記録する）"""
+    __tablename__ = "keyword_daily_counts"
+
+    keyword = Column(String, primary_key=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+
+class KeywordWindowCountDB(Base):
+    """直近N日間（7/30/90日）のレビュー数（日別の増分から差分で更新するロールアップ）"""
+    __tablename__ = "keyword_window_counts"
+
+    keyword = Column(String, primary_key=True)
+    window_days = Column(Integer, primary_key=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id", ondelete="CASCADE"), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+
+    # 期間別ランキング（keyword・期間指定、review_count降順）をインデックスだけで辿れるようにする
+    __table_args__ = (
+        Index("ix_keyword_window_counts_ranking", keyword, window_days, review_count.desc(), facility_id),
+    )
+
+class SeenReviewDB(Base):
+    """集計済みのレビュー（同じレビューを再クロールしても二重に数えないための記録）"""
+    __tablename__ = "seen_reviews"
+
+    keyword = Column(String, primary_key=True)  # services.keywords のslug
+    review_id = Column(String, primary_key=True)  # 投稿URLの /posts/{id} 部分
+    seen_at = Column(DateTime, server_default=func.now())
+
+class RankingSnapshotDB(Base):
+    """キーワードごとの累計ランキングのスナップショット（クロール後に作り直し、読み込み時は並べ替えない）"""
+    __tablename__ = "ranking_snapshots"
+
+    keyword = Column(String, primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 1始まりの順位（review_count降順、同数はfacility_id順）
+    facility_id = Column(Integer, ForeignKey("facilities.id", ondelete="CASCADE"), nullable=False)
+    review_count = Column(Integer, nullable=False)
+    last_updated = Column(DateTime)  # keyword_countsの最終更新日時
+    previous_rank = Column(Integer, nullable=True)  # 前回のスナップショットでの順位（初登場ならNULL）
+    rank_delta = Column(Integer, nullable=True)  # previous_rank - rank（正なら順位が上がった）
+    snapshot_at = Column(DateTime, nullable=False)
+
 class ScrapingState(Base):
     """スクレイピングの状態を保存するモデル"""
     __tablename__ = "scraping_state"
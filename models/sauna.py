@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class SaunaBase(BaseModel):
@@ -7,6 +8,7 @@ class SaunaBase(BaseModel):
     url: str  # HttpUrlではなくstrを使用
     review_count: int
     last_updated: datetime
+    review_id: Optional[str] = None  # レビュー（投稿）のID。重複カウントの防止に使う
 
 class SaunaCreate(SaunaBase):
     """サウナ情報作成時に使用するモデル"""
@@ -24,21 +26,22 @@ class SaunaInDB(SaunaBase):
         from_attributes = True
 
 class SaunaRanking(BaseModel):
-    """ランキング表示用のモデル（穴場）"""
+    """ランキング表示用のモデル（全キーワード共通）"""
     name: str
     url: str  # HttpUrlではなくstrを使用
     review_count: int
     last_updated: datetime
+    total_review_count: Optional[int] = None  # 詳細ページの総レビュー数（未取得ならNone）
+    keyword_ratio: Optional[float] = None  # review_count / total_review_count
+    rank: Optional[int] = None  # 順位（累計ランキングのみ）
+    previous_rank: Optional[int] = None  # 前回のスナップショットでの順位（初登場ならNone）
+    rank_delta: Optional[int] = None  # previous_rank - rank（正なら順位が上がった）
 
     class Config:
         from_attributes = True
 
-class SaunaRankingKashikiri(BaseModel):
-    """ランキング表示用のモデル（貸切）"""
-    name: str
-    url: str  # HttpUrlではなくstrを使用
-    review_count: int
-    last_updated: datetime
-
-    class Config:
-        from_attributes = True 
\ No newline at end of file
+class CrawlPlanRequest(BaseModel):
+    """クロール計画（キーワード×都道府県）の実行リクエスト"""
+    keywords: Optional[List[str]] = None  # slugまたは検索キーワード。省略時は全キーワード
+    prefectures: Optional[List[str]] = None  # 都道府県の識別子。省略時は全国
+    num_pages: int = Field(1, ge=1, le=50, description="各単位で取得するページ数")
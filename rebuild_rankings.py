@@ -0,0 +1,221 @@
+# アーカイブからランキングを再構築するスクリプト
+#
+# クロールのアーカイブ（services.archive、Parquet）から各キーワードのレビュー数を再集計し、
+# keyword_counts・keyword_daily_counts・keyword_window_counts・ranking_snapshotsを1つのトランザクションで置き換える。
+# ネットワークにはアクセスしないので、レビュー数が膨らんだ場合もリセットと再クロールなしで直せる。
+#
+# 使い方:
+#   python rebuild_rankings.py                      # アーカイブにある全キーワード
+#   python rebuild_rankings.py --keyword anaba      # キーワードを指定
+#   python rebuild_rankings.py --dry-run            # 集計結果を表示するだけでDBは変更しない
+#
+# 注意:
+#   - アーカイブに1行も無いキーワードは（ディレクトリの指定間違いや消えたディスクでランキングを
+#     消さないように）置き換えず、エラーで終了する。空にしてよい場合は --allow-empty を指定する
+#   - アーカイブを導入する前に集計した分はアーカイブに無いため、再構築すると含まれなくなる
+#   - 起動中のサーバーのランキングのキャッシュはTTL（RANKING_CACHE_TTL）で失効するまで古い値を返す
+import argparse
+import logging
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import pyarrow as pa
+from sqlalchemy import func, select
+
+from crud import RANKING_WINDOWS_DAYS, refresh_ranking_snapshot, replace_keyword_counts
+from database.db import SessionLocal
+from models.database import KeywordCountDB, ScrapingState
+from services.archive import load_archive
+from services.keywords import get_keyword
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _records(frame) -> List[Dict]:
+    """DataFrameをPythonの値（int・datetime）の辞書のリストにする"""
+    return pa.Table.from_pandas(frame, preserve_index=False).to_pylist()
+
+
+def aggregate_archive(archive, rollup_days: Dict[int, date], today: date) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    アーカイブの増分を、キーワードごとの累計・日別・期間別の行に集計する
+
+    施設ごとのループではなくgroupbyでまとめて集計する。
+    期間別の合計は、その期間のロールアップが最後に進んだ日（rollup_days）を基準にする。
+    ロールアップは基準日の翌日以降に期間外になった日だけを差し引くので、同じ基準で集計しないと二重に引かれる。
+
+    Args:
+        archive: load_archiveで読み込んだDataFrame
+        rollup_days: 期間の日数 → ロールアップが最後に進んだ日
+        today: 日別の増分を残す基準日（roll_window_counts_asyncと同じく最長の期間より古い日は残さない）
+
+    Returns:
+        Dict: キーワード → {"rows", "daily_rows", "window_rows"}
+    """
+    # 施設名は最後に取り込んだときの名前を使う
+    archive = archive.sort_values("crawled_at")
+    totals = archive.groupby(["keyword", "url"], sort=False).agg(
+        name=("name", "last"),
+        review_count=("review_count", "sum"),
+        last_updated=("last_updated", "max"),
+    ).reset_index()
+    daily = archive.groupby(["keyword", "url", "date"], sort=False)["review_count"].sum().reset_index()
+
+    windows = []
+    for window_days in RANKING_WINDOWS_DAYS:
+        start = (rollup_days[window_days] - timedelta(days=window_days)).isoformat()
+        window = daily[daily["date"] > start].groupby(["keyword", "url"], sort=False)["review_count"].sum().reset_index()
+        window["window_days"] = window_days
+        windows.append(window)
+
+    oldest_day = (today - timedelta(days=max(RANKING_WINDOWS_DAYS))).isoformat()
+    daily = daily[daily["date"] > oldest_day]
+
+    result = {}
+    for keyword in totals["keyword"].unique():
+        daily_rows = _records(daily[daily["keyword"] == keyword])
+        for row in daily_rows:
+            row["day"] = date.fromisoformat(row["date"])
+        result[keyword] = {
+            "rows": _records(totals[totals["keyword"] == keyword]),
+            "daily_rows": daily_rows,
+            "window_rows": [row for window in windows for row in _records(window[window["keyword"] == keyword])],
+        }
+    return result
+
+
+def rebuild_rankings(
+    archive_dir: str,
+    keywords: List[str],
+    dry_run: bool = False,
+    allow_empty: bool = False
+) -> Dict[str, int]:
+    """
+    アーカイブからランキングを再構築する
+
+    Args:
+        archive_dir: アーカイブのディレクトリ
+        keywords: 再構築するキーワード（空ならアーカイブにある登録済みのキーワード全て）
+        dry_run: Trueなら集計結果を表示するだけでDBは変更しない
+        allow_empty: Trueならアーカイブに行が無いキーワードも空のランキングで置き換える
+
+    Raises:
+        ValueError: 未登録のキーワード、またはallow_emptyなしでアーカイブに行が無いキーワードがある場合
+
+    Returns:
+        Dict[str, int]: キーワード → 再構築した施設数
+    """
+    started = time.monotonic()
+    today = date.today()
+    configs = []
+    for keyword in keywords:
+        config = get_keyword(keyword)
+        if config is None:
+            raise ValueError(f"未登録のキーワードです: {keyword}")
+        configs.append(config)
+
+    if not Path(archive_dir).exists():
+        logger.warning(f"アーカイブのディレクトリがありません: {archive_dir}")
+    archive = load_archive(archive_dir)
+    if not configs:
+        # 指定が無ければアーカイブにある登録済みのキーワード全て
+        for slug in archive["keyword"].unique():
+            config = get_keyword(slug)
+            if config is None:
+                logger.warning(f"未登録のキーワードのためスキップします: {slug}")
+                continue
+            configs.append(config)
+    slugs = [config.slug for config in configs]
+    archive = archive[archive["keyword"].isin(slugs)]
+    logger.info(f"アーカイブを読み込みました: {len(archive)}行（{', '.join(slugs) or 'なし'}）")
+    if not slugs:
+        logger.warning("再構築するキーワードがありません")
+        return {}
+
+    # アーカイブに行が無いキーワードを置き換えると、そのキーワードのランキングが全て消える
+    empty_slugs = [slug for slug in slugs if not (archive["keyword"] == slug).any()]
+    if empty_slugs and not allow_empty:
+        raise ValueError(
+            f"アーカイブに行が無いため置き換えません: {', '.join(empty_slugs)}"
+            "（空のランキングで置き換える場合は --allow-empty を指定）"
+        )
+
+    with SessionLocal() as db:
+        try:
+            states = {
+                state.key: state.value
+                for state in db.query(ScrapingState).filter(
+                    ScrapingState.key.in_([f"rollup:{window_days}" for window_days in RANKING_WINDOWS_DAYS])
+                )
+            }
+            rollup_days = {}
+            for window_days in RANKING_WINDOWS_DAYS:
+                state_key = f"rollup:{window_days}"
+                if state_key in states:
+                    rollup_days[window_days] = date.fromordinal(states[state_key])
+                else:
+                    rollup_days[window_days] = today
+                    db.add(ScrapingState(key=state_key, value=today.toordinal()))
+
+            aggregated = aggregate_archive(archive, rollup_days, today)
+            logger.info(f"集計が完了しました（{time.monotonic() - started:.2f}秒）")
+
+            rebuilt = {}
+            for slug in slugs:
+                batch = aggregated.get(slug, {"rows": [], "daily_rows": [], "window_rows": []})
+                rebuilt[slug] = len(batch["rows"])
+                total_before = db.scalar(
+                    select(func.coalesce(func.sum(KeywordCountDB.review_count), 0))
+                    .where(KeywordCountDB.keyword == slug)
+                )
+                total_after = sum(row["review_count"] for row in batch["rows"])
+                logger.info(f"{slug}: {rebuilt[slug]}施設、レビュー数の合計 {total_before} → {total_after}")
+                if dry_run:
+                    continue
+                replace_keyword_counts(db, slug, batch["rows"], batch["daily_rows"], batch["window_rows"])
+                refresh_ranking_snapshot(db, slug, commit=False)
+
+            if dry_run:
+                db.rollback()
+                logger.info("--dry-runのためDBは変更していません")
+            else:
+                # 全キーワードをまとめて1回でコミットするので、途中で失敗しても元のランキングのまま
+                db.commit()
+                logger.info(f"ランキングを再構築しました（{time.monotonic() - started:.2f}秒）")
+            return rebuilt
+
+        except Exception as e:
+            logger.error(f"ランキングの再構築中にエラーが発生: {e}")
+            db.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="クロールのアーカイブからランキングを再構築する")
+    parser.add_argument(
+        "--archive-dir",
+        default=os.getenv("CRAWL_ARCHIVE_DIR", "data/archive"),
+        help="アーカイブのディレクトリ（デフォルト: CRAWL_ARCHIVE_DIR または data/archive）",
+    )
+    parser.add_argument(
+        "--keyword",
+        action="append",
+        default=[],
+        help="再構築するキーワード（複数指定可、省略時はアーカイブにある全キーワード）",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="集計結果を表示するだけでDBは変更しない")
+    parser.add_argument(
+        "--allow-empty",
+        action="store_true",
+        help="アーカイブに行が無いキーワードも空のランキングで置き換える",
+    )
+    args = parser.parse_args()
+    try:
+        rebuild_rankings(args.archive_dir, args.keyword, args.dry_run, args.allow_empty)
+    except ValueError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
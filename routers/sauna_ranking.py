@@ -1,15 +1,57 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
 from services.scraper import SaunaScraper
-from database.db import get_db
-from crud import bulk_upsert_saunas, get_sauna_ranking
-from models.database import ScrapingState, SaunaDB, SaunaKashikiriDB
-from models.sauna import SaunaRanking, SaunaRankingKashikiri, SaunaBase
-from typing import Dict, List
+from database.db import SessionLocal, get_db, get_async_db
+from crud import (
+    EXPORT_BATCH_SIZE,
+    RANKING_WINDOWS_DAYS,
+    iter_keyword_export_rows,
+    count_keyword_facilities_async,
+    get_snapshot_ranking_async,
+    get_window_ranking_async,
+    get_scraping_state_async,
+    keyword_cursor_filter,
+    reset_keyword_cursors_async,
+    set_scraping_state_async,
+)
+from models.database import (
+    ScrapingState,
+    FacilityDB,
+    KeywordCountDB,
+    KeywordDailyCountDB,
+    KeywordWindowCountDB,
+    SeenReviewDB,
+    RankingSnapshotDB,
+)
+from models.sauna import CrawlPlanRequest, SaunaRanking
+from typing import Dict, Iterator, List, Optional, Tuple
+import base64
+import binascii
+import csv
+import io
+import json
 import logging
-from datetime import datetime
-from pydantic import BaseModel
+import os
+from pydantic import TypeAdapter
+from services.extractors import REVIEW_COUNT_SELECTOR
+from services.ranking_cache import CachedRanking, RankingPage, compute_etag, ranking_cache
+from services.jobs import job_runner
+from services.keywords import DEFAULT_KEYWORD, DEFAULT_PREFECTURE, KEYWORDS, PREFECTURES, CrawlUnit, KeywordConfig, build_crawl_plan, get_keyword
+from services.scheduler import (
+    CRAWL_CURSOR,
+    CRAWL_INCREMENTAL,
+    CRAWL_MODES,
+    CRAWL_PLAN_JOB_KEY,
+    ENRICH_JOB_KEY,
+    crawl_job_key,
+    make_crawl_job,
+    crawl_plan_lock_keys,
+    make_crawl_plan_job,
+    make_enrich_job,
+)
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
@@ -20,87 +62,279 @@ router = APIRouter()
 # （リクエストごとに作成する必要はない）
 sauna_scraper = SaunaScraper()
 
-# ランキング用のレスポンスモデル
-class SaunaRanking(BaseModel):
-    name: str
-    url: str
-    review_count: int
-    last_updated: datetime
+_ranking_adapter = TypeAdapter(List[SaunaRanking])
 
-    class Config:
-        from_attributes = True
+# ランキングのレスポンスに付けるCache-Control（CDN・リバースプロキシでの共有キャッシュ用）
+RANKING_CACHE_CONTROL = os.getenv(
+    "RANKING_CACHE_CONTROL",
+    "public, max-age=60, stale-while-revalidate=300"
+)
 
-@router.get("/api/github-action-scraping")
-async def run_github_action_scraping(
-    db: Session = Depends(get_db)
-) -> Dict:
+# ランキングの1ページに返す最大件数（キャッシュのキーにも件数が入るので、無制限にはしない）
+RANKING_MAX_LIMIT = int(os.getenv("RANKING_MAX_LIMIT", "200"))
+
+# エクスポートの形式とContent-Type
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_COLUMNS = ("facility_id", "name", "url", "review_count", "total_review_count", "last_updated")
+
+def _resolve_keyword(keyword: str) -> KeywordConfig:
+    """slugまたは検索キーワードから設定を取得する（未登録なら404）"""
+    config = get_keyword(keyword)
+    if config is None:
+        raise HTTPException(status_code=404, detail=f"Unknown keyword: {keyword}")
+    return config
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Matchヘッダーが現在のETagに一致するか（弱い比較）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _parse_window(window: str) -> Optional[int]:
+    """集計期間（"7d"/"30d"/"90d"/"all"）を日数に変換する（allはNone、未対応なら400）"""
+    if window == "all":
+        return None
+    days = window.removesuffix("d")
+    if days.isdigit() and int(days) in RANKING_WINDOWS_DAYS:
+        return int(days)
+    choices = ", ".join([f"{days}d" for days in RANKING_WINDOWS_DAYS] + ["all"])
+    raise HTTPException(status_code=400, detail=f"Unknown window: {window} (choices: {choices})")
+
+def _encode_cursor(*values: int) -> str:
+    """ページの最後の行の並び順のキーから次のページのカーソル（不透明な文字列）を作る"""
+    raw = ":".join(str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, size: int) -> Tuple[int, ...]:
+    """カーソルを並び順のキー（size個の整数）に戻す（不正な値なら400）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        values = tuple(int(value) for value in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = ()
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    return values
+
+async def _load_ranking_json(
+    db: AsyncSession,
+    limit: int,
+    config: KeywordConfig,
+    window_days: Optional[int],
+    cursor: Optional[str] = None
+) -> RankingPage:
+    """
+    ランキングをDBから取得してJSONバイト列にシリアライズし、続きがあれば次のカーソルも返す
+
+    累計はスナップショットを順位で、期間別はロールアップを (review_count, facility_id) で辿る
+    """
+    if window_days is None:
+        after_rank = _decode_cursor(cursor, 1)[0] if cursor else None
+        saunas = await get_snapshot_ranking_async(db, config.slug, limit, after_rank)
+        last_key = lambda row: (row.rank,)
+    else:
+        after = _decode_cursor(cursor, 2) if cursor else None
+        saunas = await get_window_ranking_async(db, config.slug, window_days, limit, after)
+        last_key = lambda row: (row.review_count, row.id)
+    payload = _ranking_adapter.dump_json([SaunaRanking.model_validate(sauna) for sauna in saunas])
+    next_cursor = _encode_cursor(*last_key(saunas[-1])) if saunas and len(saunas) == limit else None
+    return payload, next_cursor
+
+async def _ranking_response(
+    request: Request,
+    db: AsyncSession,
+    limit: int,
+    config: KeywordConfig,
+    window: str = "all",
+    cursor: Optional[str] = None
+) -> Response:
+    """
+    キャッシュ済みのJSONがあればそのまま返し、無ければDBから作成してキャッシュする
+
+    If-None-Matchが現在のETagと一致する場合は本文なしの304を返す。
+    続きのページがある場合はX-Next-Cursorヘッダーにカーソルを入れる。
+    2ページ目以降（cursor指定）はキーセットで直接読むのでキャッシュしない。
+    """
+    window_days = _parse_window(window)
+    if cursor is None:
+        cached = await ranking_cache.get_or_load_async(
+            config.slug,
+            limit,
+            lambda: _load_ranking_json(db, limit, config, window_days),
+            window
+        )
+    else:
+        payload, next_cursor = await _load_ranking_json(db, limit, config, window_days, cursor)
+        cached = CachedRanking(payload=payload, etag=compute_etag(payload), next_cursor=next_cursor)
+    headers = {"ETag": cached.etag, "Cache-Control": RANKING_CACHE_CONTROL}
+    if cached.next_cursor:
+        headers["X-Next-Cursor"] = cached.next_cursor
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.payload, media_type="application/json", headers=headers)
+
+def _resolve_prefecture(prefecture: str) -> str:
+    """都道府県の識別子を確認する（未登録なら400）"""
+    if prefecture not in PREFECTURES:
+        raise HTTPException(status_code=400, detail=f"Unknown prefecture: {prefecture}")
+    return prefecture
+
+def _job_response(job, created: bool) -> Dict:
+    return {
+        "message": "Scraping job accepted" if created else "Scraping job already in progress",
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": not created,
+        "status_url": f"/api/jobs/{job.id}"
+    }
+
+def _submit_scraping_job(config: KeywordConfig, num_pages: int, mode: str = CRAWL_CURSOR) -> Dict:
+    """
+    スクレイピングをバックグラウンドジョブとして登録する
+
+    同じキーワードのジョブ（そのキーワードを含むクロール計画を含む）が待機中・実行中の場合は
+    （クロール方式に関係なく）新しく作らず、そのジョブを返す
+    """
+    if mode not in CRAWL_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown crawl mode: {mode}")
+    job, created = job_runner.submit(
+        crawl_job_key(config),
+        make_crawl_job(sauna_scraper, config, num_pages, mode)
+    )
+    return {"keyword": config.slug, **_job_response(job, created)}
+
+@router.get("/api/keywords")
+async def list_keywords() -> List[Dict]:
+    """集計対象のキーワード一覧を返すエンドポイント"""
+    return [
+        {
+            "slug": config.slug,
+            "term": config.term,
+            "ranking_url": f"/api/ranking/{config.slug}",
+            "scrape_url": f"/api/scrape/{config.slug}"
+        }
+        for config in KEYWORDS
+    ]
+
+@router.get("/api/scrape/{keyword}", status_code=202)
+async def run_keyword_scraping(keyword: str, num_pages: int = 3, mode: str = CRAWL_INCREMENTAL) -> Dict:
     """
-    GitHub Actionsから呼び出されるスクレイピング実行とDB保存を行うエンドポイント
+    指定キーワードのスクレイピング実行とDB保存を行うエンドポイント
+    
+    スクレイピングはバックグラウンドジョブで実行し、すぐに202を返す。
+    進捗は /api/jobs/{job_id} で確認する。
     
     Args:
-        db: データベースセッション（FastAPIのDependsで自動注入）
+        keyword: キーワードのslugまたは検索キーワード（例: anaba, 貸切）
+        num_pages: スクレイピングするページ数（incrementalでは最大ページ数）
+        mode: incremental（新着のみ）または cursor（ページカーソルの続きから）
     
     Returns:
-        Dict: 実行結果を含むJSON
+        Dict: 登録したジョブの情報を含むJSON
         {
+            "keyword": str,
             "message": str,
-            "count": int,
-            "current_page": int
+            "job_id": str,
+            "status": str,
+            "deduplicated": bool,
+            "status_url": str
         }
-    
-    Raises:
-        HTTPException: スクレイピングまたはDB保存処理で失敗した場合
     """
-    try:
-        # スクレイピングを実行（DBセッションを渡す）
-        scraped_saunas = sauna_scraper.run_scheduled_scraping(db, num_pages=3)
-        
-        # スクレイピングしたデータをDBに保存
-        try:
-            saved_saunas = bulk_upsert_saunas(db, scraped_saunas)
-            
-            # 現在のスクレイピング状態を取得
-            stmt = select(ScrapingState).where(ScrapingState.key == "last_page")
-            state = db.execute(stmt).scalar_one_or_none()
-            
-            # 成功レスポンスを返す
-            return {
-                "message": "Scraping and DB update completed successfully",
-                "count": len(saved_saunas),
-                "current_page": state.value if state else 1
-            }
-            
-        except Exception as db_error:
-            # DB保存時のエラーをログに記録
-            logger.error(f"Database operation failed: {str(db_error)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Database operation failed: {str(db_error)}"
-            )
-            
-    except Exception as scraping_error:
-        # スクレイピング時のエラーをログに記録
-        logger.error(f"Scraping failed: {str(scraping_error)}")
-        
-        # クライアントにエラーレスポンスを返す
+    return _submit_scraping_job(_resolve_keyword(keyword), num_pages, mode)
+
+@router.post("/api/crawl-plan", status_code=202)
+async def run_crawl_plan(plan: CrawlPlanRequest) -> Dict:
+    """
+    キーワード×都道府県の全組み合わせをまとめてスクレイピングするエンドポイント
+
+    全単位のページを共有のフェッチャー（同時接続数・レート制限つき）で並行に取得し、
+    単位ごとのページカーソルの続きから num_pages ページずつ取り込む。
+    クロール計画は同時に1つだけ実行し、実行中なら既存のジョブを返す。
+    対象キーワードのスクレイピング（/api/scrape/{keyword}）が実行中の場合も、そのジョブを返す。
+    """
+    configs = [_resolve_keyword(keyword) for keyword in plan.keywords] if plan.keywords else KEYWORDS
+    prefectures = [_resolve_prefecture(prefecture) for prefecture in plan.prefectures] if plan.prefectures else PREFECTURES
+    units = build_crawl_plan(configs, prefectures)
+
+    job, created = job_runner.submit(
+        CRAWL_PLAN_JOB_KEY,
+        make_crawl_plan_job(sauna_scraper, units, plan.num_pages),
+        lock_keys=crawl_plan_lock_keys(units)
+    )
+    return {
+        "keywords": [config.slug for config in configs],
+        "prefectures": prefectures,
+        "units": len(units),
+        **_job_response(job, created)
+    }
+
+@router.post("/api/enrich-facilities", status_code=202)
+async def run_enrich_facilities(limit: Optional[int] = None) -> Dict:
+    """
+    施設詳細ページから総レビュー数を取得するエンドポイント
+
+    未取得の施設と、前回の取得からTTL（DETAIL_TTL_HOURS）以上経ってレビューが増えた施設だけを対象に、
+    バックグラウンドジョブで取得する。
+    総レビュー数のセレクタ（環境変数 REVIEW_COUNT_SELECTOR）が未設定の間は無効で、503を返す。
+    """
+    if not REVIEW_COUNT_SELECTOR:
         raise HTTPException(
-            status_code=500,
-            detail=f"Scraping failed: {str(scraping_error)}"
+            status_code=503,
+            detail="Facility enrichment is disabled until REVIEW_COUNT_SELECTOR is set to a verified selector"
         )
+    job, created = job_runner.submit(ENRICH_JOB_KEY, make_enrich_job(sauna_scraper, limit))
+    return _job_response(job, created)
+
+@router.get("/api/github-action-scraping", status_code=202)
+async def run_github_action_scraping() -> Dict:
+    """GitHub Actionsから呼び出される穴場キーワードのスクレイピング（/api/scrape/anaba と同じ）"""
+    return _submit_scraping_job(_resolve_keyword("anaba"), num_pages=3)
+
+@router.get("/api/github-action-kashikiri", status_code=202)
+async def run_github_action_kashikiri() -> Dict:
+    """GitHub Actionsから呼び出される貸切キーワードのスクレイピング（/api/scrape/kashikiri と同じ）"""
+    return _submit_scraping_job(_resolve_keyword("kashikiri"), num_pages=3)
+
+@router.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str) -> Dict:
+    """バックグラウンドジョブの状態を確認するエンドポイント"""
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+@router.get("/api/jobs")
+async def list_jobs() -> List[Dict]:
+    """最近のバックグラウンドジョブの一覧を返すエンドポイント"""
+    return [job.to_dict() for job in job_runner.list_jobs()]
 
 @router.get("/api/scraping-state")
-async def get_scraping_state(db: Session = Depends(get_db)):
-    """現在のスクレイピング状態を確認するエンドポイント"""
+async def get_scraping_state(
+    keyword: str = DEFAULT_KEYWORD.slug,
+    prefecture: str = DEFAULT_PREFECTURE,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """現在のスクレイピング状態（キーワード×都道府県のページカーソル）を確認するエンドポイント"""
+    unit = CrawlUnit(_resolve_keyword(keyword), _resolve_prefecture(prefecture))
+    config = unit.config
     try:
-        stmt = select(ScrapingState).where(ScrapingState.key == "last_page")
-        state = db.execute(stmt).scalar_one_or_none()
+        state = await get_scraping_state_async(db, unit.cursor_key)
+        total_saunas = await count_keyword_facilities_async(db, config.slug)
         
         # 現在のスクレイピング状態の詳細情報を返す
         return {
+            "keyword": config.slug,
+            "prefecture": unit.prefecture,
             "last_page": state.value if state else None,
             "updated_at": state.updated_at.isoformat() if state else None,
             "next_page": state.value + 1 if state else 1,  # 1ページずつスクレイピング
-            "total_saunas": db.query(SaunaDB).count(),
+            "total_saunas": total_saunas,
             "last_scraping": state.updated_at.isoformat() if state else None
         }
     except Exception as e:
@@ -111,20 +345,28 @@ async def get_scraping_state(db: Session = Depends(get_db)):
         ) 
     
 @router.post("/api/reset-scraping-state")
-async def reset_scraping_state(db: Session = Depends(get_db)):
-    """スクレイピング状態（last_page）を初期化するエンドポイント"""
-    try:
-        stmt = select(ScrapingState).where(ScrapingState.key == "last_page")
-        state = db.execute(stmt).scalar_one_or_none()
+async def reset_scraping_state(
+    keyword: str = DEFAULT_KEYWORD.slug,
+    prefecture: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    スクレイピング状態（ページカーソル）を初期化するエンドポイント
 
-        if state:
-            state.value = 1
+    prefectureを指定した場合はその都道府県のカーソルだけ、省略した場合はキーワードの全都道府県のカーソルを1ページ目に戻す
+    """
+    config = _resolve_keyword(keyword)
+    unit = CrawlUnit(config, _resolve_prefecture(prefecture)) if prefecture else None
+    try:
+        if unit:
+            await set_scraping_state_async(db, unit.cursor_key, 1)
+            reset_count = 1
         else:
-            state = ScrapingState(key="last_page", value=1)
-            db.add(state)
-
-        db.commit()
-        return {"message": "Scraping state reset to page 1."}
+            reset_count = await reset_keyword_cursors_async(db, config.key_prefix)
+        # 1ページ目から取り直すページが304で読み飛ばされないようにする
+        sauna_scraper.clear_page_cache(config, unit.prefecture if unit else None)
+        target = unit.label if unit else config.slug
+        return {"message": f"Scraping state for {target} reset to page 1.", "cursors": reset_count}
 
     except Exception as e:
         logger.error(f"Failed to reset scraping state: {str(e)}")
@@ -133,60 +375,53 @@ async def reset_scraping_state(db: Session = Depends(get_db)):
             detail=f"Failed to reset scraping state: {str(e)}"
         )
 
+@router.get("/api/scraper/pool-stats")
+async def get_scraper_pool_stats() -> Dict:
+    """スクレイパーの接続プールと接続再利用の状況を確認するエンドポイント"""
+    return sauna_scraper.pool_stats()
+
 @router.get("/api/ranking", response_model=List[SaunaRanking])
 async def get_ranking(
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: int = Query(50, ge=1, le=RANKING_MAX_LIMIT),
+    window: str = "all",
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    サウナのランキングデータを取得するエンドポイント
+    サウナのランキングデータを取得するエンドポイント（/api/ranking/anaba と同じ）
     
     Args:
-        limit: 取得する上位件数（デフォルト50件）
+        request: リクエスト（If-None-Matchの確認に使用）
+        limit: 取得する上位件数（デフォルト50件、1〜RANKING_MAX_LIMIT件）
+        window: 集計期間（7d / 30d / 90d / all、デフォルトは累計のall）
+        cursor: 前のページのX-Next-Cursorヘッダーの値（続きのページを取得する場合）
         db: データベースセッション
     
     Returns:
         List[SaunaRanking]: ランキングデータのリスト
     """
-    try:
-        # レビュー数の多い順にサウナを取得
-        saunas = db.query(SaunaDB)\
-            .order_by(SaunaDB.review_count.desc())\
-            .limit(limit)\
-            .all()
-        
-        if not saunas:
-            return []
-            
-        return [
-            SaunaRanking(
-                name=sauna.name,
-                url=sauna.url,
-                review_count=sauna.review_count,
-                last_updated=sauna.last_updated
-            ) for sauna in saunas
-        ]
-        
-    except Exception as e:
-        logger.error(f"ランキングデータの取得に失敗: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to get ranking data: {str(e)}"
-        )
+    return await get_keyword_ranking(request, DEFAULT_KEYWORD.slug, limit, window, cursor, db)
 
 # デバッグ用のエンドポイント
 @router.get("/api/ranking/debug")
 async def debug_ranking(db: Session = Depends(get_db)):
     """ランキングデータの状態を確認するエンドポイント"""
     try:
-        total_count = db.query(SaunaDB).count()
-        latest = db.query(SaunaDB)\
-            .order_by(SaunaDB.last_updated.desc())\
-            .first()
+        rows = db.query(
+                KeywordCountDB.keyword,
+                func.count(KeywordCountDB.facility_id),
+                func.max(KeywordCountDB.last_updated)
+            )\
+            .group_by(KeywordCountDB.keyword)\
+            .all()
         
         return {
-            "total_saunas": total_count,
-            "latest_update": latest.last_updated if latest else None,
+            "total_saunas": db.query(FacilityDB).count(),
+            "keywords": {
+                keyword: {"total_saunas": count, "latest_update": latest}
+                for keyword, count, latest in rows
+            },
             "database_status": "connected"
         }
     except Exception as e:
@@ -195,132 +430,149 @@ async def debug_ranking(db: Session = Depends(get_db)):
             "database_status": "error"
         }
 
-@router.post("/api/reset-database")
-async def reset_database(db: Session = Depends(get_db)):
-    """データベースをリセットするエンドポイント（開発用）"""
+@router.get("/api/ranking/{keyword}", response_model=List[SaunaRanking])
+async def get_keyword_ranking(
+    request: Request,
+    keyword: str,
+    limit: int = Query(50, ge=1, le=RANKING_MAX_LIMIT),
+    window: str = "all",
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    指定キーワードのサウナランキングを取得するエンドポイント
+    
+    Args:
+        request: リクエスト（If-None-Matchの確認に使用）
+        keyword: キーワードのslugまたは検索キーワード（例: anaba, kashikiri）
+        limit: 取得する上位件数（デフォルト50件、1〜RANKING_MAX_LIMIT件）
+        window: 集計期間（7d / 30d / 90d / all）。7d等は日別の増分から事前集計した
+            ロールアップを読むので、履歴が増えても速度は変わらない。
+            allはクロール後に作り直すスナップショットを順位順に読み、順位の変動（rank_delta）も返す
+        cursor: 前のページのX-Next-Cursorヘッダーの値。OFFSETを使わないキーセットページングなので、
+            何ページ目でも1ページ目と同じコストで取得できる
+        db: データベースセッション
+    
+    Returns:
+        List[SaunaRanking]: ランキングデータのリスト
+    """
+    config = _resolve_keyword(keyword)
     try:
-        # 既存のデータを全て削除
-        db.query(SaunaDB).delete()
-        db.query(ScrapingState).delete()
-        
-        # スクレイピング状態を初期化
-        initial_state = ScrapingState(key="last_page", value=1)
-        db.add(initial_state)
+        # レビュー数の多い順のランキング（スクレイピングで更新されるまではキャッシュから返す）
+        return await _ranking_response(request, db, limit, config, window, cursor)
         
-        db.commit()
-        
-        return {
-            "message": "データベースを正常にリセットしました",
-            "status": "success",
-            "saunas_count": db.query(SaunaDB).count(),
-            "next_page": 1
-        }
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
-        logger.error(f"データベースリセット中にエラー: {e}")
+        logger.error(f"ランキングデータの取得に失敗: {e}")
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to reset database: {str(e)}"
+            detail=f"Failed to get ranking data: {str(e)}"
         )
 
-# ---- 穴場関連のエンドポイント ----
+def _export_values(row) -> Dict:
+    values = dict(row._mapping)
+    if values["last_updated"] is not None:
+        values["last_updated"] = values["last_updated"].isoformat()
+    return values
 
-@router.get("/api/github-action-scraping")
-async def run_github_action_scraping(db: Session = Depends(get_db)) -> Dict:
-    """穴場キーワードのスクレイピングを実行"""
+def _iter_export_chunks(config: KeywordConfig, export_format: str) -> Iterator[str]:
+    """
+    エクスポートの本文をEXPORT_BATCH_SIZE行ずつの文字列で返すジェネレーター
+
+    レスポンスの送信中も読み続けるので、リクエストのセッションではなく専用のセッションを使う
+    （依存関係のセッションはレスポンスの送信前に閉じられることがある）
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS) if export_format == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    db = SessionLocal()
     try:
-        scraped_saunas = sauna_scraper.run_scheduled_scraping(
-            db, 
-            num_pages=1,
-            keyword="穴場",
-            key_prefix="last_page"
-        )
-        
-        saved_saunas = bulk_upsert_saunas(db, scraped_saunas, SaunaDB)
-        
-        return {
-            "message": "穴場キーワードのスクレイピングが完了しました",
-            "count": len(saved_saunas)
-        }
-        
-    except Exception as e:
-        logger.error(f"スクレイピング失敗: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Scraping failed: {str(e)}"
-        )
+        rows = 0
+        for row in iter_keyword_export_rows(db, config.slug):
+            if writer:
+                writer.writerow(_export_values(row))
+            else:
+                buffer.write(json.dumps(_export_values(row), ensure_ascii=False) + "\n")
+            rows += 1
+            # 1行ずつ送るとスレッドプールとの往復が増えるため、バッチ単位でまとめて送る
+            if rows % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        logger.info(f"エクスポートが完了しました（keyword={config.slug}, format={export_format}, {rows}件）")
+    finally:
+        db.close()
 
-@router.get("/api/ranking", response_model=List[SaunaRanking])
-async def get_ranking(
-    limit: int = 50,
-    db: Session = Depends(get_db)
-):
-    """穴場サウナのランキングデータを取得"""
-    return get_sauna_ranking(db, limit, SaunaDB)
+@router.get("/api/export/{keyword}")
+async def export_keyword_counts(keyword: str, format: str = "ndjson"):
+    """
+    キーワードの全施設のレビュー数をNDJSONまたはCSVでストリーミング出力するエンドポイント
 
-# ---- 貸切関連のエンドポイント ----
+    サーバーサイドカーソルから少しずつ読んで送るので、行数が増えてもメモリ使用量は一定。
+    分析用のバッチなどで全件を取得する場合に使う。
 
-@router.get("/api/github-action-kashikiri")
-async def run_github_action_kashikiri(
-    db: Session = Depends(get_db)
-) -> Dict:
+    Args:
+        keyword: キーワードのslugまたは検索キーワード
+        format: ndjson（デフォルト）または csv
     """
-    GitHub Actionsから呼び出される貸切キーワードのスクレイピング実行とDB保存を行うエンドポイント
+    config = _resolve_keyword(keyword)
+    media_type = EXPORT_MEDIA_TYPES.get(format)
+    if media_type is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format: {format} (choices: {', '.join(EXPORT_MEDIA_TYPES)})"
+        )
+    return StreamingResponse(
+        _iter_export_chunks(config, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{config.slug}.{format}"'}
+    )
+
+@router.post("/api/reset-database")
+async def reset_database(keyword: Optional[str] = None, db: Session = Depends(get_db)):
     """
+    データベースをリセットするエンドポイント（開発用）
+
+    keywordを指定した場合はそのキーワードのレビュー数・集計済みレビュー・ページカーソルだけを削除する
+    """
+    configs = [_resolve_keyword(keyword)] if keyword else KEYWORDS
     try:
-        # スクレイピングを実行
-        scraped_saunas = sauna_scraper.run_scheduled_scraping(
-            db, 
-            num_pages=3,
-            keyword="貸切",
-            key_prefix="last_page_kashikiri"
-        )
+        for config in configs:
+            db.query(KeywordCountDB).filter(KeywordCountDB.keyword == config.slug).delete()
+            # 集計済みの記録も消さないと、再クロールしたレビューが数えられない
+            db.query(SeenReviewDB).filter(SeenReviewDB.keyword == config.slug).delete()
+            db.query(KeywordDailyCountDB).filter(KeywordDailyCountDB.keyword == config.slug).delete()
+            db.query(KeywordWindowCountDB).filter(KeywordWindowCountDB.keyword == config.slug).delete()
+            db.query(RankingSnapshotDB).filter(RankingSnapshotDB.keyword == config.slug).delete()
+            # 都道府県ごとのカーソルも消さないと、クロール計画が深いページから再開して先頭のページを数え直さない
+            db.query(ScrapingState).filter(keyword_cursor_filter(config.key_prefix)).delete(synchronize_session=False)
+            # スクレイピング状態を初期化
+            db.add(ScrapingState(key=config.key_prefix, value=1))
+        if not keyword:
+            # どのキーワードからも参照されない施設も含めて全て削除
+            db.query(FacilityDB).delete()
         
-        # ここで変数の初期化が必要
-        converted_saunas = []
-        
-        for sauna in scraped_saunas:
-            converted = SaunaBase(
-                name=sauna.name,
-                url=str(sauna.url),
-                review_count=sauna.review_count,
-                last_updated=sauna.last_updated
-            )
-            converted_saunas.append(converted)
+        db.commit()
+        for config in configs:
+            ranking_cache.invalidate(config.slug)
+            # 条件付きGETのキャッシュが残っていると、再クロールが304になって何も数えられない
+            sauna_scraper.clear_page_cache(config)
         
-        # DBに保存
-        try:
-            saved_saunas = bulk_upsert_saunas(db, converted_saunas, SaunaKashikiriDB)
-            
-            # 現在のスクレイピング状態を取得
-            stmt = select(ScrapingState).where(ScrapingState.key == "last_page_kashikiri")
-            state = db.execute(stmt).scalar_one_or_none()
-            
-            # 成功レスポンスを返す
-            return {
-                "message": "Kashikiri scraping and DB update completed successfully",
-                "count": len(saved_saunas),
-                "current_page": state.value if state else 1
-            }
-            
-        except Exception as db_error:
-            logger.error(f"Kashikiri database operation failed: {str(db_error)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Kashikiri database operation failed: {str(db_error)}"
-            )
-            
-    except Exception as scraping_error:
-        logger.error(f"Kashikiri scraping failed: {str(scraping_error)}")
+        return {
+            "message": "データベースを正常にリセットしました",
+            "status": "success",
+            "keywords": [config.slug for config in configs],
+            "saunas_count": db.query(FacilityDB).count(),
+            "next_page": 1
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"データベースリセット中にエラー: {e}")
         raise HTTPException(
             status_code=500,
-            detail=f"Kashikiri scraping failed: {str(scraping_error)}"
+            detail=f"Failed to reset database: {str(e)}"
         )
-
-@router.get("/api/ranking/kashikiri", response_model=List[SaunaRankingKashikiri])
-async def get_kashikiri_ranking(
-    limit: int = 50,
-    db: Session = Depends(get_db)
-):
-    """貸切サウナのランキングデータを取得"""
-    return get_sauna_ranking(db, limit, SaunaKashikiriDB)
\ No newline at end of file
@@ -0,0 +1,134 @@
+import logging
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+def _archive_schema():
+    # keyword・dateはディレクトリ名（keyword=.../date=...）で表すので列には含めない
+    return pa.schema([
+        ("facility_id", pa.int64()),
+        ("name", pa.string()),
+        ("url", pa.string()),
+        ("review_count", pa.int32()),
+        ("last_updated", pa.timestamp("us")),
+        ("crawled_at", pa.timestamp("us")),
+    ])
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("keyword", pa.string()), ("date", pa.string())]), flavor="hive")
+
+
+class CrawlArchive:
+    """
+    クロールで加算したレビュー数をParquetで追記していくアーカイブ
+
+    DBのレビュー数は加算で上書きされていくため、クロールごとの増分をここに残しておき、
+    分析やランキングの再構築は本番のDBではなくこのアーカイブから行う。
+    1回の取り込みごとに root/keyword={slug}/date={YYYY-MM-DD}/part-*.parquet を1ファイル書く。
+
+    pyarrowがインストールされていない場合は何も書かない。
+
+    Args:
+        root: アーカイブを保存するディレクトリ
+    """
+
+    def __init__(self, root: str = "data/archive"):
+        self.root = Path(root)
+        self.enabled = pa is not None
+        if not self.enabled:
+            logger.warning("pyarrowがインストールされていないため、クロールのアーカイブは無効です")
+
+    def partition_dir(self, keyword: str, day: date) -> Path:
+        return self.root / f"keyword={keyword}" / f"date={day.isoformat()}"
+
+    def append(self, keyword: str, rows: List[Dict[str, Any]], crawled_at: Optional[datetime] = None) -> Optional[Path]:
+        """
+        1回の取り込みで加算した行（crudの保存関数の戻り値）を1ファイルとして書き込む
+
+        書き込み途中のファイルを読まれないよう、"."始まりの一時ファイル（読み込み時は無視される）に書いてから名前を変更する
+
+        Returns:
+            Optional[Path]: 書き込んだファイル（無効・行が無い場合はNone）
+        """
+        if not self.enabled or not rows:
+            return None
+
+        crawled_at = crawled_at or datetime.now()
+        table = pa.Table.from_pylist(
+            [
+                {
+                    "facility_id": row["facility_id"],
+                    "name": row["name"],
+                    "url": row["url"],
+                    "review_count": row["review_count"],
+                    "last_updated": row["last_updated"],
+                    "crawled_at": crawled_at,
+                }
+                for row in rows
+            ],
+            schema=_archive_schema(),
+        )
+        directory = self.partition_dir(keyword, crawled_at.date())
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-{crawled_at:%H%M%S%f}-{uuid.uuid4().hex[:8]}.parquet"
+        temp_path = directory / f".{path.name}.tmp"
+        pq.write_table(table, temp_path, compression="zstd")
+        temp_path.replace(path)
+        logger.info(f"クロールの増分をアーカイブしました: {path}（{len(rows)}件）")
+        return path
+
+
+def load_archive(
+    root: str = "data/archive",
+    keyword: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """
+    アーカイブをpandasのDataFrameとして読み込む
+
+    keyword・日付の範囲はディレクトリ名で絞り込むので、対象外のファイルは開かない。
+    列はArrowのバッファをそのまま使うArrowDtypeで読み込む（NumPyへのコピーをしない）。
+
+    Args:
+        root: アーカイブのディレクトリ
+        keyword: キーワードのslug（省略時は全キーワード）
+        start: この日以降（省略時は最初から）
+        end: この日以前（省略時は最後まで）
+
+    Returns:
+        pandas.DataFrame: facility_id, name, url, review_count, last_updated, crawled_at, keyword, date
+    """
+    if pa is None:
+        raise RuntimeError("アーカイブの読み込みにはpyarrowが必要です（pip install pyarrow）")
+    import pandas as pd
+
+    schema = _archive_schema().append(pa.field("keyword", pa.string())).append(pa.field("date", pa.string()))
+    if not Path(root).exists():
+        # まだ一度も書き込んでいない場合は空のDataFrameを返す
+        return schema.empty_table().to_pandas(types_mapper=pd.ArrowDtype)
+    dataset = ds.dataset(root, format="parquet", partitioning=_partitioning(), schema=schema)
+    conditions = []
+    if keyword is not None:
+        conditions.append(ds.field("keyword") == keyword)
+    if start is not None:
+        conditions.append(ds.field("date") >= start.isoformat())
+    if end is not None:
+        conditions.append(ds.field("date") <= end.isoformat())
+    filter_expression = None
+    for condition in conditions:
+        filter_expression = condition if filter_expression is None else filter_expression & condition
+
+    return dataset.to_table(filter=filter_expression).to_pandas(types_mapper=pd.ArrowDtype)
@@ -0,0 +1,211 @@
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+from datetime import datetime
+from typing import Dict, List, Optional, Type
+from models.sauna import SaunaBase
+from urllib.parse import urljoin
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# レビューカードとサウナ施設リンクのセレクタ
+POST_CARD_CLASS = "p-postCard"
+POST_CARD_CLASS_PATTERN = re.compile(rf"(^|\s){POST_CARD_CLASS}(\s|$)")
+FACILITY_LINK_SELECTOR = ".p-postCard_facility a"
+# レビューカード内の投稿詳細へのリンク（/posts/{id}）
+POST_LINK_SELECTOR = 'a[href*="/posts/"]'
+POST_ID_PATTERN = re.compile(r"/posts/([^/?#]+)")
+
+
+# 施設詳細ページの総レビュー（サ活）数の要素のセレクタ。
+# 実際の詳細ページで確認したセレクタはまだ無いため既定では空で、その間は総レビュー数の取得
+# （SaunaScraper.enrich_facilities_async）は無効になる。確認したセレクタを環境変数で設定すると有効になる。
+REVIEW_COUNT_SELECTOR = os.getenv("REVIEW_COUNT_SELECTOR", "")
+
+
+def extract_review_count(content: bytes, parser: str = "html.parser", selector: str = REVIEW_COUNT_SELECTOR) -> Optional[int]:
+    """施設詳細ページのHTMLから総レビュー数を取り出す（セレクタが未設定・見つからなければNone）"""
+    if not selector:
+        return None
+    soup = BeautifulSoup(content, parser)
+    review_element = soup.select_one(selector)
+    if review_element is None:
+        return None
+    digits = "".join(filter(str.isdigit, review_element.text))
+    return int(digits) if digits else None
+
+
+def _has_class_xpath(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def extract_review_id(href: Optional[str]) -> Optional[str]:
+    """投稿詳細のリンクからレビューIDを取り出す（見つからなければNone）"""
+    if not href:
+        return None
+    match = POST_ID_PATTERN.search(href)
+    return match.group(1) if match else None
+
+
+def build_sauna(name: str, href: str, base_url: str, review_id: Optional[str] = None) -> SaunaBase:
+    """レビューカードから取り出した施設名とリンクをSaunaBaseに変換"""
+    # URLが完全URLの場合はそのまま、相対パスの場合はベースURLと結合
+    full_url = href if href.startswith("http") else urljoin(base_url, href)
+
+    # 各レビュー = 1カウントとして扱う
+    return SaunaBase(
+        name=name.strip(),
+        url=str(full_url),  # 文字列として保存
+        review_count=1,
+        last_updated=datetime.now(),
+        review_id=review_id
+    )
+
+
+class ReviewExtractor(ABC):
+    """
+    レビュー一覧ページのHTMLからサウナ情報を取り出すインターフェース
+
+    実装クラスはextractを実装し、EXTRACTORSに登録すると
+    SaunaScraper(extractor="名前") で切り替えられる。
+    """
+    name = ""
+
+    @abstractmethod
+    def extract(self, content: bytes, base_url: str) -> List[SaunaBase]:
+        """1ページ分のHTMLからレビューカードごとのSaunaBaseを取り出す"""
+
+
+class SoupReviewExtractor(ReviewExtractor):
+    """
+    BeautifulSoupによる抽出（.p-postCard の部分木だけを解析する）
+
+    Args:
+        parser: BeautifulSoupのパーサー名（省略時はlxmlがあればlxml、無ければhtml.parser）
+    """
+    name = "soup"
+
+    def __init__(self, parser: Optional[str] = None):
+        if parser is None:
+            try:
+                import lxml  # noqa: F401
+                parser = "lxml"
+            except ImportError:
+                parser = "html.parser"
+        self.parser = parser
+        # class属性の文字列全体ではなくクラスのトークン単位で判定する
+        # （class="p-postCard foo" のように複数のクラスを持つカードも対象にする）
+        self.strainer = SoupStrainer(attrs={"class": POST_CARD_CLASS_PATTERN})
+
+    def extract(self, content: bytes, base_url: str) -> List[SaunaBase]:
+        soup = BeautifulSoup(content, self.parser, parse_only=self.strainer)
+        review_items = soup.select(f".{POST_CARD_CLASS}")
+        logger.debug(f"review_items 件数: {len(review_items)}")
+
+        saunas = []
+        for item in review_items:
+            try:
+                name_link_element = item.select_one(FACILITY_LINK_SELECTOR)
+                if name_link_element:
+                    post_link = item.select_one(POST_LINK_SELECTOR)
+                    review_id = extract_review_id(post_link.get("href")) if post_link else None
+                    saunas.append(build_sauna(name_link_element.text, name_link_element.get("href"), base_url, review_id))
+            except Exception as e:
+                logger.error(f"サウナ情報の解析中にエラーが発生しました: {e}")
+                continue
+        return saunas
+
+
+class LxmlReviewExtractor(ReviewExtractor):
+    """lxml.html と XPath による抽出（BeautifulSoupのツリーを作らない）"""
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import html
+        self._html = html
+        self.card_xpath = f"//*[{_has_class_xpath(POST_CARD_CLASS)}]"
+        self.link_xpath = f".//*[{_has_class_xpath('p-postCard_facility')}]//a"
+        self.post_link_xpath = ".//a[contains(@href, '/posts/')]/@href"
+
+    def extract(self, content: bytes, base_url: str) -> List[SaunaBase]:
+        if not content:
+            return []
+        # 文字コードはBeautifulSoupと同じ方法で判定してからlxmlに渡す
+        # （lxmlはmetaで宣言されていないページをLatin-1として読み、日本語の施設名が文字化けする）
+        tree = self._html.fromstring(UnicodeDammit(content, is_html=True).unicode_markup)
+        review_items = tree.xpath(self.card_xpath)
+        logger.debug(f"review_items 件数: {len(review_items)}")
+
+        saunas = []
+        for item in review_items:
+            try:
+                links = item.xpath(self.link_xpath)
+                if links:
+                    post_hrefs = item.xpath(self.post_link_xpath)
+                    review_id = extract_review_id(post_hrefs[0]) if post_hrefs else None
+                    saunas.append(build_sauna(links[0].text_content(), links[0].get("href"), base_url, review_id))
+            except Exception as e:
+                logger.error(f"サウナ情報の解析中にエラーが発生しました: {e}")
+                continue
+        return saunas
+
+
+class SelectolaxReviewExtractor(ReviewExtractor):
+    """selectolax による抽出（selectolaxがインストールされている場合のみ利用可能）"""
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.parser import HTMLParser
+        self._parser = HTMLParser
+
+    def extract(self, content: bytes, base_url: str) -> List[SaunaBase]:
+        review_items = self._parser(content).css(f".{POST_CARD_CLASS}")
+        logger.debug(f"review_items 件数: {len(review_items)}")
+
+        saunas = []
+        for item in review_items:
+            try:
+                link = item.css_first(FACILITY_LINK_SELECTOR)
+                if link is not None:
+                    post_link = item.css_first(POST_LINK_SELECTOR)
+                    review_id = extract_review_id(post_link.attributes.get("href")) if post_link is not None else None
+                    saunas.append(build_sauna(link.text(), link.attributes.get("href"), base_url, review_id))
+            except Exception as e:
+                logger.error(f"サウナ情報の解析中にエラーが発生しました: {e}")
+                continue
+        return saunas
+
+
+EXTRACTORS: Dict[str, Type[ReviewExtractor]] = {
+    SoupReviewExtractor.name: SoupReviewExtractor,
+    LxmlReviewExtractor.name: LxmlReviewExtractor,
+    SelectolaxReviewExtractor.name: SelectolaxReviewExtractor,
+}
+
+
+def get_extractor(name: str = "soup") -> ReviewExtractor:
+    """名前から抽出器を作成する"""
+    try:
+        extractor_class = EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f"未知の抽出器です: {name}（利用可能: {', '.join(EXTRACTORS)}）")
+    return extractor_class()
+
+
+# ワーカープロセス内で抽出器を使い回すためのキャッシュ
+_extractor_cache: Dict[str, ReviewExtractor] = {}
+
+
+def extract_page(content: bytes, extractor_name: str, base_url: str) -> List[SaunaBase]:
+    """
+    1ページ分のHTMLを解析する（ProcessPoolExecutorのワーカーから呼ばれる）
+
+    抽出器はプロセスごとに一度だけ作成して再利用する。
+    """
+    extractor = _extractor_cache.get(extractor_name)
+    if extractor is None:
+        extractor = get_extractor(extractor_name)
+        _extractor_cache[extractor_name] = extractor
+    return extractor.extract(content, base_url)
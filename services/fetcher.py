@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.http_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# 速度を落として再試行する対象のステータスコード（過負荷・一時的なエラー）
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# アクセスを拒否されている可能性があるステータスコード（再試行はしないが、速度を落とす）
+BLOCKED_STATUS_CODES = frozenset({403})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を待機秒数に変換する"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    ホスト単位のリクエスト間隔を制御するトークンバケット
+
+    Args:
+        rate: 1秒あたりに補充されるトークン数（= 許容するリクエスト数/秒）
+        capacity: バーストとして許容する最大トークン数
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """トークンを1つ予約し、補充されるまで必要な時間だけ待機する"""
+        # 先にトークンを予約してから待つので、ロックなしでも待機順が崩れない
+        self._refill()
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    応答の状態に合わせてレートを調整するトークンバケット（加算増加・乗算減少）
+
+    - 速い正常応答が続く間は、1回ごとにincrease_stepずつmax_rateまでレートを上げる
+    - 429/5xxや接続エラーではレートをbackoff_factor倍に下げ、Retry-After
+      （無ければ連続失敗回数に応じた指数バックオフ）の間はこのホストへの送信を止める
+    - 応答時間がlatency_targetを超えた場合もレートを下げる（送信は止めない）
+
+    Args:
+        rate: 開始時のリクエスト数/秒
+        capacity: バーストとして許容する最大トークン数
+        min_rate: 下げる場合の下限（リクエスト数/秒）
+        max_rate: 上げる場合の上限（リクエスト数/秒）
+        increase_step: 正常応答1回あたりに上げるレート
+        backoff_factor: 失敗・遅延時にレートへ掛ける係数
+        latency_target: これを超える応答時間（秒）を遅延とみなす
+        base_backoff: Retry-Afterが無い場合の最初の待機秒数
+        max_backoff: 待機秒数の上限
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        min_rate: float = 0.1,
+        max_rate: Optional[float] = None,
+        increase_step: float = 0.1,
+        backoff_factor: float = 0.5,
+        latency_target: float = 2.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        super().__init__(rate, capacity)
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate or rate, rate)
+        self.increase_step = increase_step
+        self.backoff_factor = backoff_factor
+        self.latency_target = latency_target
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.paused_until = 0.0
+        self.consecutive_failures = 0
+
+    async def acquire(self) -> None:
+        """送信停止中なら再開まで待ってから、トークンを1つ取得する"""
+        # 待っている間に停止が延長されることもあるので、再開時刻を確認し直す
+        while True:
+            delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await super().acquire()
+
+    def _set_rate(self, rate: float) -> None:
+        # 変更前のレートで補充してから切り替える
+        self._refill()
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def on_success(self, latency: float) -> None:
+        """正常な応答を記録する"""
+        self.consecutive_failures = 0
+        if latency > self.latency_target:
+            self._set_rate(self.rate * self.backoff_factor)
+        else:
+            self._set_rate(self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        429/5xx・接続エラーを記録してレートを下げ、送信を止める秒数を返す
+        """
+        self.consecutive_failures += 1
+        self._set_rate(self.rate * self.backoff_factor)
+        if retry_after is None:
+            retry_after = self.base_backoff * 2 ** (self.consecutive_failures - 1)
+        delay = min(self.max_backoff, retry_after)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def paused_for(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+
+@dataclass
+class FetchResult:
+    """1ページ分の取得結果"""
+    url: str
+    status_code: Optional[int] = None
+    content: Optional[bytes] = None
+    error: Optional[Exception] = None
+    # 304 Not Modified（contentはキャッシュ済みの本文）
+    not_modified: bool = False
+    # 429/5xx・接続エラーなど、時間をおけば成功する可能性がある失敗
+    retryable: bool = False
+
+    @property
+    def ok(self) -> bool:
+        # 解析後にcontentを破棄することがあるので、応答を受け取れたかどうかで判定する
+        return self.error is None and self.status_code is not None and self.status_code < 400
+
+
+class AsyncFetcher:
+    """
+    同時接続数を制限しつつ、keep-alive接続を共有してページを並行取得する非同期フェッチャー
+
+    ホストごとのレートは応答に合わせて調整する（AdaptiveTokenBucket）。
+
+    Args:
+        headers: 全リクエストに付与するヘッダー
+        max_concurrency: 同時に実行するリクエストの上限
+        requests_per_second: ホストごとの開始時のリクエスト数/秒
+        max_requests_per_second: 正常な応答が続いた場合に上げるリクエスト数/秒の上限
+        latency_target: これを超える応答時間（秒）ではレートを下げる
+        burst: ホストごとに連続して送れるリクエスト数
+        pool_size: keep-aliveで保持する接続数の上限
+        connect_timeout: 接続確立のタイムアウト（秒）
+        read_timeout: レスポンス読み込みのタイムアウト（秒）
+        cache: 条件付きGETに使うレスポンスキャッシュ（Noneなら無効）
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        max_concurrency: int = 4,
+        requests_per_second: float = 1.0,
+        max_requests_per_second: Optional[float] = None,
+        latency_target: float = 2.0,
+        burst: int = 1,
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 20.0,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.headers = headers or {}
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_requests_per_second = max_requests_per_second or requests_per_second
+        self.latency_target = latency_target
+        self.burst = burst
+        self.pool_size = pool_size
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.cache = cache
+        self._buckets: Dict[str, AdaptiveTokenBucket] = {}
+        # 接続再利用の確認用カウンタ
+        self._requests = 0
+        self._connections_opened = 0
+        self._not_modified = 0
+        self._throttled = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """実行中のイベントループに紐づくクライアントを返す"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # asyncio.run() などで別のループから呼ばれた場合はクライアントを作り直す
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=max(self.max_concurrency, self.pool_size),
+                    max_keepalive_connections=self.pool_size,
+                ),
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def _trace(self, event_name: str, info: Dict) -> None:
+        """httpcoreのtraceイベントから新規接続の数を数える"""
+        if event_name == "connection.connect_tcp.complete":
+            self._connections_opened += 1
+
+    def stats(self) -> Dict:
+        """リクエスト数と新規接続数（差分が再利用された接続）、ホストごとの現在のレートを返す"""
+        return {
+            "pool_size": self.pool_size,
+            "requests": self._requests,
+            "connections_opened": self._connections_opened,
+            "reused": max(0, self._requests - self._connections_opened),
+            "not_modified": self._not_modified,
+            "throttled": self._throttled,
+            "hosts": {
+                host: {
+                    "requests_per_second": round(bucket.rate, 3),
+                    "paused_seconds": round(bucket.paused_for(), 3),
+                    "consecutive_failures": bucket.consecutive_failures,
+                }
+                for host, bucket in self._buckets.items()
+            },
+        }
+
+    def _bucket_for(self, url: str) -> AdaptiveTokenBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = AdaptiveTokenBucket(
+                self.requests_per_second,
+                self.burst,
+                max_rate=self.max_requests_per_second,
+                latency_target=self.latency_target,
+            )
+            self._buckets[host] = bucket
+        return bucket
+
+    def _throttle(self, bucket: AdaptiveTokenBucket, url: str, reason: str, retry_after: Optional[float] = None) -> None:
+        self._throttled += 1
+        delay = bucket.on_throttle(retry_after)
+        logger.warning(
+            f"アクセスを減速します: {url} ({reason}) "
+            f"{delay:.1f}秒停止, {bucket.rate:.2f}リクエスト/秒"
+        )
+
+    async def fetch(self, url: str) -> FetchResult:
+        """
+        1ページを取得する（失敗しても例外は投げずFetchResultに格納する）
+
+        429/5xx・接続エラーではホストのレートを下げて送信を止め、retryable=Trueの結果を返す。
+        再試行するかどうかは呼び出し側が決める。
+        レートを上げるのは2xx/304の応答だけで、403では（再試行はしないが）レートを下げて送信を止める。
+        """
+        client = self._ensure_client()
+        bucket = self._bucket_for(url)
+        async with self._semaphore:
+            await bucket.acquire()
+            try:
+                headers = self.cache.conditional_headers(url) if self.cache else {}
+                self._requests += 1
+                started_at = time.monotonic()
+                response = await client.get(url, headers=headers, extensions={"trace": self._trace})
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    self._throttle(
+                        bucket, url, f"HTTP {response.status_code}",
+                        parse_retry_after(response.headers.get("Retry-After"))
+                    )
+                    return FetchResult(
+                        url=url,
+                        status_code=response.status_code,
+                        error=httpx.HTTPStatusError(
+                            f"HTTP {response.status_code}", request=response.request, response=response
+                        ),
+                        retryable=True,
+                    )
+                if response.status_code in BLOCKED_STATUS_CODES:
+                    # ブロックされ始めた場合にレートを上げ続けないよう、減速して送信を止める
+                    self._throttle(
+                        bucket, url, f"HTTP {response.status_code}",
+                        parse_retry_after(response.headers.get("Retry-After"))
+                    )
+                elif response.is_success or response.status_code == 304:
+                    # 404などの4xxはサーバーの負荷とは関係ないので、レートを変えない
+                    bucket.on_success(time.monotonic() - started_at)
+                if response.status_code == 304 and self.cache:
+                    self._not_modified += 1
+                    return FetchResult(
+                        url=url,
+                        status_code=304,
+                        content=self.cache.get_body(url) or b"",
+                        not_modified=True,
+                    )
+                response.raise_for_status()
+                if self.cache:
+                    await asyncio.to_thread(
+                        self.cache.store,
+                        url,
+                        response.content,
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                    )
+                return FetchResult(url=url, status_code=response.status_code, content=response.content)
+            except httpx.HTTPStatusError as e:
+                logger.error(f"ページの取得に失敗しました: {url} ({e})")
+                return FetchResult(url=url, status_code=e.response.status_code, error=e)
+            except httpx.TransportError as e:
+                # タイムアウト・接続エラーは過負荷の可能性があるので減速する
+                self._throttle(bucket, url, type(e).__name__)
+                return FetchResult(url=url, error=e, retryable=True)
+            except httpx.HTTPError as e:
+                logger.error(f"ページの取得に失敗しました: {url} ({e})")
+                return FetchResult(url=url, error=e)
+
+    async def aclose(self) -> None:
+        """保持している接続を閉じる"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
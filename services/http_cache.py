@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    条件付きGET用のディスクキャッシュ
+
+    URLごとにETag/Last-Modifiedとレスポンス本文を保存し、
+    合計サイズがmax_bytesを超えたら最も古く参照されたものから削除する（LRU）。
+
+    Args:
+        cache_dir: キャッシュを保存するディレクトリ
+        max_bytes: 本文の合計サイズの上限（バイト）
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str = "data/http_cache", max_bytes: int = 64 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 先頭ほど参照が古い（LRUの削除候補）
+        self._index: "OrderedDict[str, Dict]" = OrderedDict()
+        self._total_bytes = 0
+        # 304で本文をキャッシュから返した回数
+        self.hits = 0
+        self._load_index()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.body"
+
+    def _load_index(self) -> None:
+        index_path = self.cache_dir / self.INDEX_FILE
+        if not index_path.exists():
+            return
+        try:
+            entries = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"キャッシュのインデックスを読み込めませんでした: {e}")
+            return
+
+        for entry in sorted(entries, key=lambda e: e.get("accessed_at", 0)):
+            key = self._key(entry["url"])
+            if self._body_path(key).exists():
+                self._index[key] = entry
+                self._total_bytes += entry.get("size", 0)
+
+    def _save_index(self) -> None:
+        index_path = self.cache_dir / self.INDEX_FILE
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(list(self._index.values()), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, index_path)
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._index:
+            key, entry = self._index.popitem(last=False)
+            self._total_bytes -= entry.get("size", 0)
+            try:
+                self._body_path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """保存済みのバリデータから If-None-Match / If-Modified-Since ヘッダーを作る"""
+        with self._lock:
+            entry = self._index.get(self._key(url))
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get_body(self, url: str) -> Optional[bytes]:
+        """304を受け取ったURLの保存済み本文を返す（参照順も更新する）"""
+        key = self._key(url)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            entry["accessed_at"] = time.time()
+            self._index.move_to_end(key)
+            self.hits += 1
+
+        try:
+            return self._body_path(key).read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                entry = self._index.pop(key, None)
+                if entry:
+                    self._total_bytes -= entry.get("size", 0)
+            return None
+
+    def store(self, url: str, content: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """バリデータ付きのレスポンスを保存する（バリデータが無ければ保存しない）"""
+        if not etag and not last_modified:
+            return
+
+        key = self._key(url)
+        self._body_path(key).write_bytes(content)
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous:
+                self._total_bytes -= previous.get("size", 0)
+            self._index[key] = {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(content),
+                "accessed_at": time.time(),
+            }
+            self._total_bytes += len(content)
+            self._evict()
+            self._save_index()
+
+    def invalidate(self, match: Callable[[str], bool]) -> int:
+        """
+        URLがmatchに当てはまるエントリを削除する
+
+        DBの集計を初期化した後も古いバリデータが残っていると、再クロールが304になって
+        ページが解析されないため、リセット時に対象のページのキャッシュを消す。
+
+        Returns:
+            int: 削除したエントリ数
+        """
+        with self._lock:
+            keys = [key for key, entry in self._index.items() if match(entry["url"])]
+            for key in keys:
+                entry = self._index.pop(key)
+                self._total_bytes -= entry.get("size", 0)
+                try:
+                    self._body_path(key).unlink()
+                except FileNotFoundError:
+                    pass
+            if keys:
+                self._save_index()
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """キャッシュの件数・サイズ・ヒット数を返す"""
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+            }
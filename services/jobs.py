@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """バックグラウンドで実行するジョブ1件分の状態"""
+    id: str
+    key: str
+    status: str = JOB_QUEUED
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    # key以外に、実行中は同じキーのジョブを作らせないキー
+    lock_keys: Tuple[str, ...] = ()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "key": self.key,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobRunner:
+    """
+    プロセス内でスクレイピングなどのジョブを非同期に実行するランナー
+
+    - 同じキー（例: キーワード）のジョブが待機中・実行中なら新しく作らずそれを返す（single-flight）
+    - 複数のキーワードを扱うジョブはlock_keysでそれらのキーも押さえ、キーワードごとのジョブと重ならないようにする
+    - 同時に実行するジョブ数はmax_workersまで
+    - 終了したジョブはhistory_size件まで状態を保持する
+
+    Args:
+        max_workers: 同時に実行するジョブ数の上限
+        history_size: 保持するジョブの件数
+    """
+
+    def __init__(self, max_workers: int = 2, history_size: int = 100):
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active_by_key: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        lock_keys: Iterable[str] = ()
+    ) -> Tuple[Job, bool]:
+        """
+        ジョブを登録して実行を開始する（イベントループ内から呼ぶ）
+
+        Args:
+            key: 重複実行を防ぐためのキー
+            func: 実行するコルーチン関数（引数なし）
+            lock_keys: keyと同じく重複実行を防ぐキー（いずれかのキーのジョブが待機中・実行中なら作らない）
+
+        Returns:
+            Tuple[Job, bool]: ジョブと、新しく作成したかどうか（Falseなら重なる既存ジョブ）
+        """
+        lock_keys = tuple(lock_key for lock_key in lock_keys if lock_key != key)
+        for job_key in (key, *lock_keys):
+            active_id = self._active_by_key.get(job_key)
+            if active_id is not None:
+                return self._jobs[active_id], False
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        job = Job(id=uuid.uuid4().hex, key=key, lock_keys=lock_keys)
+        self._jobs[job.id] = job
+        for job_key in (key, *lock_keys):
+            self._active_by_key[job_key] = job.id
+        self._tasks[job.id] = asyncio.create_task(self._run(job, func))
+        self._trim_history()
+        return job, True
+
+    async def _run(self, job: Job, func: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            async with self._semaphore:
+                job.status = JOB_RUNNING
+                job.started_at = datetime.now()
+                logger.info(f"ジョブを開始しました: {job.key} ({job.id})")
+                job.result = await func()
+                job.status = JOB_SUCCEEDED
+                logger.info(f"ジョブが完了しました: {job.key} ({job.id})")
+        except asyncio.CancelledError:
+            job.status = JOB_FAILED
+            job.error = "cancelled"
+            raise
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error(f"ジョブが失敗しました: {job.key} ({job.id}): {e}")
+        finally:
+            job.finished_at = datetime.now()
+            for job_key in (job.key, *job.lock_keys):
+                if self._active_by_key.get(job_key) == job.id:
+                    del self._active_by_key[job_key]
+            self._tasks.pop(job.id, None)
+
+    def _trim_history(self) -> None:
+        """古い終了済みジョブから削除して件数を抑える"""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history_size:
+                break
+            if not self._jobs[job_id].active:
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def get_active(self, key: str) -> Optional[Job]:
+        """指定キーで待機中・実行中のジョブを返す"""
+        job_id = self._active_by_key.get(key)
+        return self._jobs.get(job_id) if job_id else None
+
+    async def wait(self, job_id: str) -> Optional[Job]:
+        """ジョブの終了を待って返す（終了済みならそのまま返す）"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            # 待っている側がキャンセルされてもジョブ自体は止めない
+            await asyncio.wait([task])
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        """新しい順にジョブを返す"""
+        return list(reversed(self._jobs.values()))
+
+    async def shutdown(self) -> None:
+        """実行中のジョブをキャンセルして終了を待つ"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# アプリケーション全体で共有するジョブランナー
+job_runner = JobRunner(max_workers=int(os.getenv("SCRAPE_JOB_WORKERS", "2")))
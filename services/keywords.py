@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class KeywordConfig:
+    """
+    集計対象キーワードの設定
+
+    Attributes:
+        slug: URLやDBで使う識別子（/api/ranking/{slug}、keyword_counts.keyword）
+        term: サウナイキタイで検索するキーワード
+        key_prefix: ScrapingStateに保存するページカーソルのキー
+        legacy_table: キーワード別テーブル時代の移行元テーブル名
+    """
+    slug: str
+    term: str
+    key_prefix: str
+    legacy_table: Optional[str] = None
+
+
+# キーワードを増やす場合はここに追加するだけでよい（テーブルやエンドポイントは共通）
+KEYWORDS: List[KeywordConfig] = [
+    KeywordConfig(slug="anaba", term="穴場", key_prefix="last_page", legacy_table="saunas"),
+    KeywordConfig(slug="kashikiri", term="貸切", key_prefix="last_page_kashikiri", legacy_table="saunas_kashikiri"),
+]
+
+DEFAULT_KEYWORD = KEYWORDS[0]
+
+# サウナイキタイの検索で使う都道府県の識別子（prefecture[0]=...）
+PREFECTURES: List[str] = [
+    "hokkaido", "aomori", "iwate", "miyagi", "akita", "yamagata", "fukushima",
+    "ibaraki", "tochigi", "gunma", "saitama", "chiba", "tokyo", "kanagawa",
+    "niigata", "toyama", "ishikawa", "fukui", "yamanashi", "nagano",
+    "gifu", "shizuoka", "aichi", "mie",
+    "shiga", "kyoto", "osaka", "hyogo", "nara", "wakayama",
+    "tottori", "shimane", "okayama", "hiroshima", "yamaguchi",
+    "tokushima", "kagawa", "ehime", "kochi",
+    "fukuoka", "saga", "nagasaki", "kumamoto", "oita", "miyazaki", "kagoshima", "okinawa",
+]
+
+DEFAULT_PREFECTURE = "tokyo"
+
+_BY_NAME: Dict[str, KeywordConfig] = {}
+for _config in KEYWORDS:
+    _BY_NAME[_config.slug] = _config
+    _BY_NAME[_config.term] = _config
+
+
+def get_keyword(name: str) -> Optional[KeywordConfig]:
+    """slugまたは検索キーワードから設定を返す（未登録ならNone）"""
+    return _BY_NAME.get(name)
+
+
+@dataclass(frozen=True)
+class CrawlUnit:
+    """クロール計画の1単位（キーワード×都道府県）"""
+    config: KeywordConfig
+    prefecture: str = DEFAULT_PREFECTURE
+
+    @property
+    def cursor_key(self) -> str:
+        # 東京は従来どおりのキーを使い、既存のページカーソルを引き継ぐ
+        if self.prefecture == DEFAULT_PREFECTURE:
+            return self.config.key_prefix
+        return f"{self.config.key_prefix}:{self.prefecture}"
+
+    @property
+    def label(self) -> str:
+        return f"{self.config.slug}/{self.prefecture}"
+
+
+def build_crawl_plan(configs: List[KeywordConfig], prefectures: List[str]) -> List[CrawlUnit]:
+    """キーワード×都道府県の全組み合わせを作る"""
+    return [CrawlUnit(config, prefecture) for config in configs for prefecture in prefectures]
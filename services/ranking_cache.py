@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CachedRanking(NamedTuple):
+    """シリアライズ済みのランキングとそのバージョン（ETag）、次のページのカーソル"""
+    payload: bytes
+    etag: str
+    next_cursor: Optional[str] = None
+
+
+# loaderが返す (JSONバイト列, 次のページのカーソル)
+RankingPage = Tuple[bytes, Optional[str]]
+
+
+def compute_etag(payload: bytes) -> str:
+    """レスポンス本文からETagを作る（キャッシュ作成時に1回だけ計算する）"""
+    return '"' + hashlib.blake2b(payload, digest_size=12).hexdigest() + '"'
+
+
+class RankingCache:
+    """
+    ランキングのレスポンス（シリアライズ済みJSON）を保持するプロセス内キャッシュ
+
+    キーは (キーワード, 件数, 集計期間)。本文と一緒にETagを保持する。
+    データの更新時に invalidate で破棄し、
+    更新の通知が届かない場合に備えてTTLでも失効させる。
+    エントリがmax_entriesに達したら、失効済みのエントリ、次に古いエントリから破棄する。
+    invalidateのたびにキーワードの世代を進め、読み込み中に世代が変わった（更新がコミットされた）
+    ランキングは保存しない。読み込みを始めた時点の古いランキングがTTLの間返され続けないようにするため。
+
+    Args:
+        ttl_seconds: エントリの有効期間（秒）
+        max_entries: 保持するエントリの上限
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, int, str], Tuple[float, CachedRanking]] = {}
+        # invalidateの回数（全キーワード分と、キーワードごと）
+        self._generation_all = 0
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _generation(self, keyword: str) -> Tuple[int, int]:
+        return self._generation_all, self._generations.get(keyword, 0)
+
+    def generation(self, keyword: str) -> Tuple[int, int]:
+        """キーワードの世代（読み込みを始める前に取得してsetに渡す）"""
+        with self._lock:
+            return self._generation(keyword)
+
+    def get(self, keyword: str, limit: int, window: str = "all") -> Optional[CachedRanking]:
+        """有効なエントリがあればJSONバイト列とETagを返す"""
+        key = (keyword, limit, window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, cached = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return cached
+
+    def set(
+        self,
+        keyword: str,
+        limit: int,
+        payload: bytes,
+        window: str = "all",
+        next_cursor: Optional[str] = None,
+        generation: Optional[Tuple[int, int]] = None
+    ) -> CachedRanking:
+        """
+        エントリを保存する
+
+        generationを指定した場合、それ以降にキーワードがinvalidateされていれば保存せずに返すだけにする
+        """
+        cached = CachedRanking(payload=payload, etag=compute_etag(payload), next_cursor=next_cursor)
+        key = (keyword, limit, window)
+        now = time.monotonic()
+        with self._lock:
+            if generation is not None and generation != self._generation(keyword):
+                logger.debug(f"読み込み中にランキングが更新されたため、キャッシュしません: {keyword}")
+                return cached
+            # 入れ直して末尾（最新）に移す。辞書の先頭が最も古いエントリになる
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[key] = (now + self.ttl_seconds, cached)
+        return cached
+
+    def _evict(self, now: float) -> None:
+        """失効済みのエントリを破棄し、それでも上限に達していれば古い順に破棄する（ロックを取得して呼ぶ）"""
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at < now]:
+            del self._entries[key]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def get_or_load(self, keyword: str, limit: int, loader: Callable[[], RankingPage], window: str = "all") -> CachedRanking:
+        """キャッシュにあればそれを返し、無ければloaderで作成して保存する"""
+        cached = self.get(keyword, limit, window)
+        if cached is None:
+            generation = self.generation(keyword)
+            payload, next_cursor = loader()
+            cached = self.set(keyword, limit, payload, window, next_cursor, generation)
+        return cached
+
+    async def get_or_load_async(
+        self,
+        keyword: str,
+        limit: int,
+        loader: Callable[[], Awaitable[RankingPage]],
+        window: str = "all"
+    ) -> CachedRanking:
+        """get_or_loadの非同期版（loaderはコルーチンを返す関数）"""
+        cached = self.get(keyword, limit, window)
+        if cached is None:
+            # DBを待っている間にinvalidateされた場合は、読み込んだランキングをキャッシュしない
+            generation = self.generation(keyword)
+            payload, next_cursor = await loader()
+            cached = self.set(keyword, limit, payload, window, next_cursor, generation)
+        return cached
+
+    def invalidate(self, keyword: Optional[str] = None) -> None:
+        """指定キーワード（Noneなら全キーワード）のエントリを破棄する"""
+        with self._lock:
+            if keyword is None:
+                self._generation_all += 1
+                self._entries.clear()
+            else:
+                self._generations[keyword] = self._generations.get(keyword, 0) + 1
+                for key in [key for key in self._entries if key[0] == keyword]:
+                    del self._entries[key]
+        logger.debug(f"ランキングキャッシュを破棄しました: {keyword or 'all'}")
+
+
+# アプリケーション全体で共有するキャッシュ
+ranking_cache = RankingCache(
+    ttl_seconds=float(os.getenv("RANKING_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("RANKING_CACHE_MAX_ENTRIES", "256")),
+)
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.db import AsyncSessionLocal
+from services.jobs import JobRunner
+from services.keywords import KEYWORDS, CrawlUnit, KeywordConfig
+from services.scraper import SaunaScraper
+import crud
+
+logger = logging.getLogger(__name__)
+
+# クロール方式
+CRAWL_INCREMENTAL = "incremental"  # 1ページ目から集計済みのレビューに到達するまで（定期更新用）
+CRAWL_CURSOR = "cursor"  # ページカーソルの続きから指定ページ数（過去分の取り込み用）
+CRAWL_MODES = (CRAWL_INCREMENTAL, CRAWL_CURSOR)
+
+
+async def refresh_stale_snapshots(db: AsyncSession, keywords: List[str]) -> Dict[str, int]:
+    """
+    スナップショットの作成後にレビュー数が加算されたキーワードだけスナップショットを作り直す
+
+    加算が無ければ作り直さないので、previous_rankは「前回レビューが増えたクロール」時点の順位のまま残る。
+    前回のクロールが途中で失敗して作り直せなかった分もここで反映される。
+
+    Returns:
+        Dict[str, int]: 作り直したキーワード → スナップショットの行数
+    """
+    refreshed = {}
+    for keyword in keywords:
+        if await crud.ranking_snapshot_is_stale_async(db, keyword):
+            refreshed[keyword] = await crud.refresh_ranking_snapshot_async(db, keyword)
+    return refreshed
+
+
+def make_crawl_job(
+    scraper: SaunaScraper,
+    config: KeywordConfig,
+    num_pages: int,
+    mode: str = CRAWL_CURSOR
+) -> Callable[[], Awaitable[Dict]]:
+    """
+    キーワード1つ分のスクレイピングを実行するジョブ関数を作る
+
+    エンドポイントとスケジューラーの両方から使う。
+    リクエストのセッションは返却後に閉じられるため、ジョブ専用のセッションを使う。
+
+    Args:
+        num_pages: カーソル方式では取得するページ数、差分方式では最大ページ数
+        mode: CRAWL_INCREMENTAL または CRAWL_CURSOR
+    """
+    if mode not in CRAWL_MODES:
+        raise ValueError(f"未知のクロール方式です: {mode}（利用可能: {', '.join(CRAWL_MODES)}）")
+
+    async def crawl() -> Dict:
+        async with AsyncSessionLocal() as db:
+            try:
+                if mode == CRAWL_INCREMENTAL:
+                    result = await scraper.ingest_incremental_async(db, config, max_pages=num_pages)
+                else:
+                    result = await scraper.ingest_scheduled_scraping_async(db, config, num_pages=num_pages)
+            finally:
+                # 途中で失敗してもコミット済みのページがあれば、スナップショット（順位と変動）を作り直す
+                snapshot_rows = await refresh_stale_snapshots(db, [config.slug])
+            result["snapshot_rows"] = snapshot_rows
+            # 新しい施設・レビューが増えた施設の総レビュー数を取得する
+            result["enriched"] = await scraper.enrich_facilities_async(db)
+            # 日付が変わっていれば期間別ランキングのロールアップを進める
+            result["rolled_days"] = await crud.roll_window_counts_async(db)
+            return result
+    return crawl
+
+
+def crawl_job_key(config: KeywordConfig) -> str:
+    """キーワードごとの重複実行防止用のジョブキー"""
+    return f"scrape:{config.slug}"
+
+
+# クロール計画・詳細ページの取得は同時に1つだけ実行する
+CRAWL_PLAN_JOB_KEY = "crawl-plan"
+ENRICH_JOB_KEY = "enrich-facilities"
+
+
+def crawl_plan_lock_keys(units: List[CrawlUnit]) -> List[str]:
+    """
+    クロール計画と同時に実行させないキーワードごとのジョブキー
+
+    計画の東京の単位はキーワードごとのジョブと同じページカーソル（key_prefix）を使うので、
+    同時に実行すると同じページを二重に取得し、カーソルも後から書いた方で上書きされる
+    """
+    return [crawl_job_key(config) for config in {unit.config.slug: unit.config for unit in units}.values()]
+
+
+def make_crawl_plan_job(
+    scraper: SaunaScraper,
+    units: List[CrawlUnit],
+    num_pages: int
+) -> Callable[[], Awaitable[Dict]]:
+    """キーワード×都道府県のクロール計画を実行するジョブ関数を作る"""
+    async def crawl() -> Dict:
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await scraper.ingest_crawl_plan_async(db, units, num_pages=num_pages)
+            finally:
+                snapshot_rows = await refresh_stale_snapshots(db, sorted({unit.config.slug for unit in units}))
+            result["snapshot_rows"] = snapshot_rows
+            result["rolled_days"] = await crud.roll_window_counts_async(db)
+            return result
+    return crawl
+
+
+def make_enrich_job(scraper: SaunaScraper, limit: Optional[int] = None) -> Callable[[], Awaitable[Dict]]:
+    """施設詳細ページの総レビュー数を取得するジョブ関数を作る"""
+    async def enrich() -> Dict:
+        async with AsyncSessionLocal() as db:
+            return await scraper.enrich_facilities_async(db, limit)
+    return enrich
+
+
+@dataclass
+class ScheduledCrawl:
+    """定期実行するスクレイピングの設定"""
+    config: KeywordConfig
+    interval_seconds: float
+    num_pages: int = 3
+    jitter_seconds: float = 0.0
+    mode: str = CRAWL_INCREMENTAL
+
+    @property
+    def keyword(self) -> str:
+        return self.config.slug
+
+    @property
+    def last_run_key(self) -> str:
+        # 前回実行時刻（UNIX秒）を保存するScrapingStateのキー
+        return f"schedule:{self.config.key_prefix}"
+
+
+def default_crawls() -> List[ScheduledCrawl]:
+    """
+    登録済みの全キーワードについて、環境変数から定期実行の設定を作る
+
+    SCHEDULE_INTERVAL_MINUTES: 実行間隔（分、デフォルト15）
+    SCHEDULE_JITTER_SECONDS: 実行時刻をずらす最大秒数（デフォルト60）
+    SCHEDULE_NUM_PAGES: 1回あたりの（差分方式では最大の）ページ数（デフォルト3）
+    SCHEDULE_MODE: クロール方式（incremental / cursor、デフォルトincremental）
+    """
+    interval_seconds = float(os.getenv("SCHEDULE_INTERVAL_MINUTES", "15")) * 60
+    jitter_seconds = float(os.getenv("SCHEDULE_JITTER_SECONDS", "60"))
+    num_pages = int(os.getenv("SCHEDULE_NUM_PAGES", "3"))
+    mode = os.getenv("SCHEDULE_MODE", CRAWL_INCREMENTAL)
+    return [
+        ScheduledCrawl(config, interval_seconds, num_pages, jitter_seconds, mode)
+        for config in KEYWORDS
+    ]
+
+
+class CrawlScheduler:
+    """
+    アプリケーション内でキーワードごとのスクレイピングを定期実行するスケジューラー
+
+    - 実行はJobRunner経由で行うため、エンドポイントからの実行とも重複しない
+    - 前回の実行が終わるまで次の実行は始めない
+    - 前回実行時刻をScrapingStateに保存し、停止中に予定時刻を過ぎていれば起動直後に1回だけ実行する
+
+    Args:
+        scraper: 使用するスクレイパー
+        runner: ジョブを実行するランナー
+        crawls: 定期実行の設定
+    """
+
+    def __init__(self, scraper: SaunaScraper, runner: JobRunner, crawls: List[ScheduledCrawl]):
+        self.scraper = scraper
+        self.runner = runner
+        self.crawls = crawls
+        self._tasks: List[asyncio.Task] = []
+        self._next_run: Dict[str, float] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """定期実行を開始する（イベントループ内から呼ぶ）"""
+        if self._tasks:
+            return
+        for crawl in self.crawls:
+            self._tasks.append(asyncio.create_task(self._run_forever(crawl)))
+        logger.info(f"スケジューラーを開始しました: {[crawl.keyword for crawl in self.crawls]}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _load_last_run(self, crawl: ScheduledCrawl) -> Optional[float]:
+        async with AsyncSessionLocal() as db:
+            state = await crud.get_scraping_state_async(db, crawl.last_run_key)
+            return float(state.value) if state else None
+
+    async def _save_last_run(self, crawl: ScheduledCrawl, started_at: float) -> None:
+        async with AsyncSessionLocal() as db:
+            await crud.set_scraping_state_async(db, crawl.last_run_key, int(started_at))
+
+    async def _run_forever(self, crawl: ScheduledCrawl) -> None:
+        try:
+            last_run = await self._load_last_run(crawl)
+        except Exception as e:
+            logger.error(f"前回実行時刻の読み込みに失敗しました: {crawl.keyword}: {e}")
+            last_run = None
+
+        while True:
+            # 予定時刻を過ぎていれば（停止中の取りこぼしを含めて）すぐに1回だけ実行する
+            now = time.time()
+            due = last_run + crawl.interval_seconds if last_run else now
+            delay = max(0.0, due - now) + random.uniform(0, crawl.jitter_seconds)
+            self._next_run[crawl.keyword] = now + delay
+            await asyncio.sleep(delay)
+
+            started_at = time.time()
+            try:
+                job, created = self.runner.submit(
+                    crawl_job_key(crawl.config),
+                    make_crawl_job(self.scraper, crawl.config, crawl.num_pages, crawl.mode)
+                )
+                if not created:
+                    logger.info(f"「{crawl.keyword}」のスクレイピングは実行中のため、終了を待ちます")
+                await self.runner.wait(job.id)
+                await self._save_last_run(crawl, started_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"定期スクレイピングに失敗しました: {crawl.keyword}: {e}")
+            last_run = started_at
+
+    def status(self) -> Dict:
+        """スケジューラーの状態と次回の実行予定を返す"""
+        crawls = []
+        for crawl in self.crawls:
+            next_run = self._next_run.get(crawl.keyword)
+            active_job = self.runner.get_active(crawl_job_key(crawl.config))
+            crawls.append({
+                "keyword": crawl.keyword,
+                "interval_seconds": crawl.interval_seconds,
+                "num_pages": crawl.num_pages,
+                "mode": crawl.mode,
+                "next_run": datetime.fromtimestamp(next_run).isoformat() if next_run else None,
+                "active_job": active_job.to_dict() if active_job else None,
+            })
+        return {"running": self.running, "crawls": crawls}
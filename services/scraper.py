@@ -1,93 +1,145 @@
+import asyncio
+from contextlib import aclosing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 from models.sauna import SaunaBase
-from urllib.parse import urljoin
 import logging
-import time
+import multiprocessing
 import os
 from collections import defaultdict
-from sqlalchemy.orm import Session
-from models.database import ScrapingState
-from sqlalchemy import select
+from urllib.parse import parse_qs, urlparse
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud
+from services.fetcher import AsyncFetcher, FetchResult
+from services.http_cache import ResponseCache
+from services.archive import CrawlArchive
+from services.extractors import REVIEW_COUNT_SELECTOR, extract_page, extract_review_count, get_extractor
+from services.keywords import DEFAULT_KEYWORD, DEFAULT_PREFECTURE, CrawlUnit, KeywordConfig
 
 logger = logging.getLogger(__name__)
 
+
+def available_cpus() -> int:
+    """このプロセスが使えるCPU数（os.cpu_countはコンテナではなくホストのCPU数を返す）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# 解析用のワーカープロセス数のデフォルト。1プロセスごとにインタプリタ分のメモリを使うので、
+# 小さいインスタンスでもメモリが足りるよう少なめにする
+DEFAULT_PARSE_WORKERS = min(2, available_cpus())
+
+
+def _option(value, name: str, default, cast):
+    """引数で指定されていなければ環境変数nameの値（未設定ならdefault）をcastして返す"""
+    if value is not None:
+        return value
+    return cast(os.getenv(name, str(default)))
+
+
 class SaunaScraper:
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        max_requests_per_second: Optional[float] = None,
+        latency_target: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        burst: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: Optional[int] = None,
+        extractor: Optional[str] = None,
+        parse_workers: Optional[int] = None,
+        parse_queue_size: Optional[int] = None,
+        detail_ttl_seconds: Optional[float] = None,
+        detail_batch_size: Optional[int] = None,
+        archive_dir: Optional[str] = None,
+    ):
+        # 引数で指定しなかった設定は、インポート時ではなくインスタンスを作る時点の環境変数から読む
+        max_concurrency = _option(max_concurrency, "SCRAPER_MAX_CONCURRENCY", 4, int)
+        requests_per_second = _option(requests_per_second, "SCRAPER_RPS", 1.0, float)
+        max_requests_per_second = _option(max_requests_per_second, "SCRAPER_MAX_RPS", 3.0, float)
+        latency_target = _option(latency_target, "SCRAPER_LATENCY_TARGET", 2.0, float)
+        max_retries = _option(max_retries, "SCRAPER_MAX_RETRIES", 3, int)
+        burst = _option(burst, "SCRAPER_BURST", 2, int)
+        pool_size = _option(pool_size, "SCRAPER_POOL_SIZE", 10, int)
+        connect_timeout = _option(connect_timeout, "SCRAPER_CONNECT_TIMEOUT", 5.0, float)
+        read_timeout = _option(read_timeout, "SCRAPER_READ_TIMEOUT", 20.0, float)
+        cache_dir = _option(cache_dir, "SCRAPER_CACHE_DIR", "data/http_cache", str)
+        cache_max_bytes = _option(cache_max_bytes, "SCRAPER_CACHE_MAX_BYTES", 64 * 1024 * 1024, int)
+        extractor = _option(extractor, "SCRAPER_EXTRACTOR", "soup", str)
+        parse_workers = _option(parse_workers, "SCRAPER_PARSE_WORKERS", DEFAULT_PARSE_WORKERS, int)
+        parse_queue_size = _option(parse_queue_size, "SCRAPER_PARSE_QUEUE_SIZE", 8, int)
+        if detail_ttl_seconds is None:
+            detail_ttl_seconds = float(os.getenv("DETAIL_TTL_HOURS", "24")) * 3600
+        detail_batch_size = _option(detail_batch_size, "DETAIL_BATCH_SIZE", 20, int)
+        archive_dir = _option(archive_dir, "CRAWL_ARCHIVE_DIR", "data/archive", str)
+
         self.base_url = "https://sauna-ikitai.com"
         self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept-Encoding": "gzip, deflate, br",
         }        
-        # ページ間の待機時間（秒）
-        self.wait_time = 3
+        self.pool_size = pool_size
+        # 429/5xx・接続エラーのページを再試行する回数
+        self.max_retries = max_retries
+        # ETag/Last-Modifiedを保存して条件付きGETを行うキャッシュ（cache_dirが空なら無効）
+        self.cache = ResponseCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # 固定のsleepではなく、ホスト単位のトークンバケットでアクセス間隔を制御する
+        # （正常な応答が続けばmax_requests_per_secondまで上げ、429/5xxや遅延で下げる）
+        self.fetcher = AsyncFetcher(
+            headers=self.headers,
+            max_concurrency=max_concurrency,
+            requests_per_second=requests_per_second,
+            max_requests_per_second=max_requests_per_second,
+            latency_target=latency_target,
+            burst=burst,
+            pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            cache=self.cache,
+        )
+        # レビューカードの抽出器（"soup" / "lxml" / "selectolax"）
+        self.extractor_name = extractor
+        self.extractor = get_extractor(extractor)
+        self.extractor_parser = getattr(self.extractor, "parser", "html.parser")
+        # 解析ステージのワーカープロセス数（0ならプロセスプールを使わずスレッドで解析）
+        self.parse_workers = parse_workers
+        # 取得ステージと解析ステージの間のキューの長さ（解析が追いつかない場合は取得を待たせる）
+        self.parse_queue_size = parse_queue_size
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        # 施設詳細ページ（総レビュー数）を取り直すまでの期間と、1回で取得する施設数
+        self.detail_ttl_seconds = detail_ttl_seconds
+        self.detail_batch_size = detail_batch_size
+        # 取り込みごとの増分を追記するParquetのアーカイブ（archive_dirが空なら無効）
+        self.archive = CrawlArchive(archive_dir) if archive_dir else None
         self.DEFAULT_START_PAGE = 1
 
-    def _get_page_content(self, url: str) -> BeautifulSoup:
-        """指定URLのページコンテンツを取得してBeautifulSoupオブジェクトを返す"""
-        try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            # デバッグ出力
-            print("=== ステータスコード:", response.status_code)
-            print("=== タイトル:", soup.title.text if soup.title else "タイトルなし")
-            print("=== HTML冒頭 ===")
-            print(soup.prettify()[:1000])  # 長すぎ防止
-
-            return soup
-
-        except requests.RequestException as e:
-            logger.error(f"ページの取得に失敗しました: {e}")
-            raise
-    
-    def scrape_sauna_reviews(self, target_url: str = None) -> List[SaunaBase]:
-        """キーワードを含むレビューページから、サウナ情報をスクレイピング"""
-        saunas = []
-        url_to_scrape = target_url or self.base_url
-        soup = self._get_page_content(url_to_scrape)
-        print("🔗 アクセスしてるURL:", url_to_scrape)
-        print("📄 HTML先頭1000文字:\n", soup.prettify()[:1000])
-        try:
-            # レビュー一覧の要素を取得
-            review_items = soup.select(".p-postCard")
-            print(f"review_items 件数: {len(review_items)}")  
-            for item in review_items:
-                try:
-                    # サウナ名とURLを取得
-                    name_link_element = item.select_one(".p-postCard_facility a")
-                    
-                    if name_link_element:
-                        name = name_link_element.text.strip()
-                        url = name_link_element.get("href")
-                        
-                        # URLが完全URLの場合はそのまま、相対パスの場合はベースURLと結合
-                        full_url = url if url.startswith("http") else urljoin(self.base_url, url)
-
-                        # 各レビュー = 1カウントとして扱う
-                        review_count = 1
-
-                        sauna = SaunaBase(
-                            name=name,
-                            url=str(full_url),  # 文字列として保存
-                            review_count=review_count,
-                            last_updated=datetime.now()
-                        )
-                        saunas.append(sauna)
+    def pool_stats(self) -> Dict:
+        """
+        接続プールの利用状況を返す
 
-                except Exception as e:
-                    logger.error(f"サウナ情報の解析中にエラーが発生しました: {e}")
-                    continue
+        Returns:
+            Dict: 非同期フェッチャーのリクエスト数・新規接続数・再利用数と、条件付きGETのキャッシュの状況
+        """
+        return {
+            "pool_size": self.pool_size,
+            "async": self.fetcher.stats(),
+            "cache": self.cache.stats() if self.cache else None,
+        }
 
-        except Exception as e:
-            logger.error(f"スクレイピング中にエラーが発生しました: {e}")
-            raise
+    def parse_sauna_reviews(self, content: bytes) -> List[SaunaBase]:
+        """取得済みのHTMLからレビューカード部分だけを解析してサウナ情報を抽出"""
+        return self.extractor.extract(content, self.base_url)
 
-        return saunas
-   
     def aggregate_saunas(self, sauna_list: List[SaunaBase]) -> List[SaunaBase]:
         """同一URLのサウナを1つにまとめて、review_countを合算する"""
         aggregated = {}
@@ -107,103 +159,474 @@ class SaunaScraper:
 
         return list(aggregated.values())
 
-    def get_review_count(self, sauna_url: str) -> int:
+    async def get_review_counts_async(self, sauna_urls: List[str]) -> Dict[str, Optional[int]]:
+        """
+        複数の施設詳細ページから総レビュー数を並行して取得する
+
+        同時接続数・レート制限は共有のフェッチャーに従い、条件付きGETのキャッシュも使う。
+
+        Returns:
+            Dict[str, Optional[int]]: URLごとの総レビュー数（取得に失敗した施設は含まない、
+                404やページに件数が無い場合はNone）
+        """
+        async def fetch_one(url: str) -> Tuple[str, FetchResult]:
+            return url, await self._fetch_with_retry(url)
+
+        counts: Dict[str, Optional[int]] = {}
+        for url, result in await asyncio.gather(*(fetch_one(url) for url in sauna_urls)):
+            if result.status_code == 404:
+                # 削除された施設はTTLが切れるまで取り直さない
+                counts[url] = None
+                continue
+            if not result.ok:
+                logger.error(f"詳細ページの取得に失敗しました: {url} ({result.error})")
+                continue
+            counts[url] = await asyncio.to_thread(extract_review_count, result.content, self.extractor_parser)
+        return counts
+
+    async def enrich_facilities_async(self, db: AsyncSession, limit: Optional[int] = None) -> Dict:
         """
-        個別のサウナページからレビュー数を取得（必要な場合に実装）
-        
+        新しい施設と、前回の取得からdetail_ttl_seconds以上経ってレビューが増えた施設だけ、
+        詳細ページの総レビュー数を取得してfacilitiesに保存する
+
         Args:
-            sauna_url: サウナの詳細ページURL
-            
+            db: 非同期データベースセッション
+            limit: 1回で取得する施設数の上限（省略時はdetail_batch_size）
+
+        総レビュー数のセレクタ（REVIEW_COUNT_SELECTOR）が未設定の間は何も取得しない。
+        取得しても必ずNoneになり、NULLの総レビュー数を保存するだけになるため。
+
         Returns:
-            int: レビュー数
+            Dict: 対象の施設数と保存した件数（無効の場合は "disabled": True）
         """
-        try:
-            soup = self._get_page_content(sauna_url)
-            # レビュー数を含む要素を取得（セレクタは実際のものに変更してください）
-            review_element = soup.select_one(".review-count")
-            if review_element:
-                count_text = review_element.text.strip()
-                return int(''.join(filter(str.isdigit, count_text)))
-            return 0
-        except Exception as e:
-            logger.error(f"レビュー数の取得に失敗しました: {e}")
-            return 0 
+        if not REVIEW_COUNT_SELECTOR:
+            logger.debug("REVIEW_COUNT_SELECTORが未設定のため、施設詳細ページの取得は無効です")
+            return {"targets": 0, "updated": 0, "disabled": True}
+        limit = self.detail_batch_size if limit is None else limit
+        if limit <= 0:
+            return {"targets": 0, "updated": 0}
+
+        stale_before = datetime.now() - timedelta(seconds=self.detail_ttl_seconds)
+        facilities = await crud.get_facilities_to_enrich_async(db, stale_before, limit)
+        if not facilities:
+            return {"targets": 0, "updated": 0}
 
-    def generate_page_url(self, page: int, keyword: str = "穴場") -> str:
-        """ページ番号とキーワードからURLを生成"""
+        logger.info(f"{len(facilities)}件の施設の詳細ページを取得します")
+        counts = await self.get_review_counts_async([facility.url for facility in facilities])
+        updated = await crud.set_total_review_counts_async(db, {
+            facility.id: counts[facility.url]
+            for facility in facilities
+            if facility.url in counts
+        })
+        return {"targets": len(facilities), "updated": updated}
+
+    def generate_page_url(self, page: int, keyword: str = "穴場", prefecture: str = DEFAULT_PREFECTURE) -> str:
+        """ページ番号・キーワード・都道府県からURLを生成"""
         encoded_keyword = requests.utils.quote(keyword)
-        return f"{self.base_url}/posts?keyword={encoded_keyword}&page={page}&prefecture[0]=tokyo"
+        return f"{self.base_url}/posts?keyword={encoded_keyword}&page={page}&prefecture[0]={prefecture}"
+
+    def clear_page_cache(self, config: KeywordConfig, prefecture: Optional[str] = None) -> int:
+        """
+        キーワード（prefecture指定時はその都道府県だけ）の一覧ページの条件付きGET用キャッシュを削除する
+
+        集計やページカーソルを初期化した後に呼ばないと、再クロールが304になって何も数えられない
 
-    def load_last_scraped_page(self, db: Session, key_prefix: str = "last_page") -> int:
-        """最後にスクレイピングしたページ番号を読み込む"""
+        Returns:
+            int: 削除したエントリ数
+        """
+        if self.cache is None:
+            return 0
+
+        def match(url: str) -> bool:
+            parsed = urlparse(url)
+            if parsed.path != "/posts":
+                return False
+            query = parse_qs(parsed.query)
+            if query.get("keyword") != [config.term]:
+                return False
+            return prefecture is None or query.get("prefecture[0]") == [prefecture]
+
+        removed = self.cache.invalidate(match)
+        logger.info(f"キーワード「{config.term}」のページキャッシュを{removed}件削除しました")
+        return removed
+
+    async def load_last_scraped_page_async(self, db: AsyncSession, key_prefix: str = "last_page") -> int:
+        """最後にスクレイピングしたページ番号（ページカーソル）を読み込む"""
         try:
-            stmt = select(ScrapingState).where(ScrapingState.key == key_prefix)
-            result = db.execute(stmt).scalar_one_or_none()
-            
-            if result is None:
-                state = ScrapingState(key=key_prefix, value=1)
-                db.add(state)
-                db.commit()
+            state = await crud.get_scraping_state_async(db, key_prefix)
+            if state is None:
+                await crud.set_scraping_state_async(db, key_prefix, 1)
                 return 1
-                
-            return result.value
-            
+            return state.value
+
         except Exception as e:
             logger.error(f"前回のページ情報の読み込みに失敗しました: {e}")
+            await db.rollback()
             return 1
 
-    def save_last_scraped_page(self, db: Session, page: int, key_prefix: str = "last_page") -> None:
-        """次回のスタートページ番号を保存"""
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        if self._parse_pool is None:
+            # イベントループ内（スレッドが動いているプロセス）からforkするとデッドロックし得るので、
+            # forkserver（使えない環境ではspawn）でワーカーを起動する
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context(start_method),
+            )
+        return self._parse_pool
+
+    async def _parse_in_worker(self, content: bytes) -> List[SaunaBase]:
+        """
+        HTML解析をワーカープロセス（parse_workers=0ならスレッド）で実行
+
+        ワーカーが異常終了して壊れたプロセスプールは作り直し、1回だけ再実行する
+        """
+        if self.parse_workers <= 0:
+            return await asyncio.to_thread(self.parse_sauna_reviews, content)
+        loop = asyncio.get_running_loop()
+        pool = self._get_parse_pool()
         try:
-            stmt = select(ScrapingState).where(ScrapingState.key == key_prefix)
-            state = db.execute(stmt).scalar_one_or_none()
-            
-            if state:
-                state.value = page
-            else:
-                state = ScrapingState(key=key_prefix, value=page)
-                db.add(state)
-                
-            db.commit()
-            logger.info(f"次回の開始ページ（{page}）を保存しました")
-            
+            return await loop.run_in_executor(pool, extract_page, content, self.extractor_name, self.base_url)
+        except BrokenProcessPool:
+            # 同時に失敗した他の解析タスクが作り直した後のプールは閉じない
+            if self._parse_pool is pool:
+                logger.warning("解析用のワーカープロセスが異常終了したため、プロセスプールを作り直します")
+                self._parse_pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await loop.run_in_executor(
+                self._get_parse_pool(), extract_page, content, self.extractor_name, self.base_url
+            )
+
+    async def _fetch_with_retry(self, url: str) -> FetchResult:
+        """1ページを取得する（429/5xx・接続エラーはmax_retries回まで再試行する）"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await self.fetcher.fetch(url)
+            except Exception as e:
+                logger.error(f"ページの取得中にエラーが発生しました: {url} ({e})")
+                return FetchResult(url=url, error=e)
+            if not result.retryable:
+                break
+        return result
+
+    async def _archive_async(self, keyword: str, rows: List[Dict], errors: List[str]) -> None:
+        """
+        コミットしたページで加算した行をアーカイブに追記する
+
+        ページごとにコミットの直後に書くので、途中でプロセスが落ちても保存済みのページの分はアーカイブに残る。
+        DBへの保存は取り消せないため失敗しても取り込みは止めず、エラーをerrorsに追加する
+        （ジョブの結果に含めて、アーカイブからの再構築でレビュー数が減ることに気付けるようにする）。
+        """
+        if self.archive is None or not rows:
+            return
+        try:
+            await asyncio.to_thread(self.archive.append, keyword, rows)
         except Exception as e:
-            logger.error(f"ページ情報の保存に失敗しました: {e}")
-            db.rollback()
+            logger.error(f"アーカイブへの書き込みに失敗しました（keyword={keyword}, {len(rows)}件）: {e}")
+            errors.append(f"{keyword}: {e}")
 
-    def scrape_multiple_pages(self, start_page: int, num_pages: int = 1, keyword: str = "穴場") -> List[SaunaBase]:
-        """指定したページ数分のサウナ情報をスクレイピング"""
-        all_saunas = []
-        end_page = start_page + num_pages
+    async def iter_fetch_and_parse(
+        self,
+        urls: List[str],
+        skip: Optional[Callable[[int], bool]] = None
+    ) -> AsyncIterator[Tuple[int, FetchResult, Optional[List[SaunaBase]]]]:
+        """
+        取得ステージと解析ステージを有界キューでつないでページを処理する
 
-        for page in range(start_page, end_page):
-            try:
-                logger.info(f"キーワード「{keyword}」のページ {page} をスクレイピング開始")
-                url = self.generate_page_url(page, keyword)
-                page_saunas = self.scrape_sauna_reviews(url)
-                all_saunas.extend(page_saunas)
-                
-                if page < end_page - 1:
-                    logger.info(f"{self.wait_time}秒待機します...")
-                    time.sleep(self.wait_time)
+        取得はAsyncFetcherの同時接続数だけのタスクで行い、取得したページの本文は
+        キューを経由してプロセスプールで解析する。キューが一杯になると取得側が待つため、
+        解析が追いつかなくても未解析のページが溜まり続けることはない。
+        処理済みのページのキューも有界なので、呼び出し側の保存（DBへのコミット）が遅い場合も取得側が待つ。
+        解析が終わったページの本文（result.content）は破棄してから渡す。
+        429/5xx・接続エラーのページは打ち切らずに取得キューの末尾へ戻し、max_retries回まで再試行する
+        （待機はフェッチャーのホスト単位のバックオフで行う）。
 
-            except Exception as e:
-                logger.error(f"ページ {page} のスクレイピングに失敗しました: {e}")
+        Args:
+            urls: 取得するページのURL
+            skip: 取得の直前に呼び、Trueを返したインデックスのページは取得しない
+                （結果が不要になったページでレート制限の枠を使わないように）
+
+        Yields:
+            (urlsのインデックス, 取得結果, 抽出結果) を処理が終わった順に返す。
+            取得失敗・304・解析失敗のページは抽出結果がNone。
+            skipしたページはステータスコードの無い（okでない）取得結果を返す。
+        """
+        # (インデックス, URL, 再試行回数) の取得待ちキュー。再試行するページは末尾に戻す
+        fetch_queue: asyncio.Queue = asyncio.Queue()
+        for index, url in enumerate(urls):
+            fetch_queue.put_nowait((index, url, 0))
+        parse_queue: asyncio.Queue = asyncio.Queue(maxsize=self.parse_queue_size)
+        done_queue: asyncio.Queue = asyncio.Queue(maxsize=self.parse_queue_size)
+
+        async def fetch_stage():
+            while True:
+                index, url, attempt = await fetch_queue.get()
+                if skip is not None and skip(index):
+                    await done_queue.put((index, FetchResult(url=url), None))
+                    continue
+                try:
+                    result = await self.fetcher.fetch(url)
+                except Exception as e:
+                    logger.error(f"ページの取得中にエラーが発生しました: {url} ({e})")
+                    result = FetchResult(url=url, error=e)
+                if result.retryable and attempt < self.max_retries:
+                    logger.info(f"ページの取得を後で再試行します（{attempt + 1}/{self.max_retries}回目）: {url}")
+                    await fetch_queue.put((index, url, attempt + 1))
+                    continue
+                if result.ok and not result.not_modified:
+                    await parse_queue.put((index, result))
+                else:
+                    result.content = None
+                    await done_queue.put((index, result, None))
+
+        async def parse_stage():
+            while True:
+                index, result = await parse_queue.get()
+                try:
+                    saunas = await self._parse_in_worker(result.content)
+                except Exception as e:
+                    logger.error(f"ページの解析に失敗しました: {result.url} ({e})")
+                    result.error = e
+                    saunas = None
+                # 解析済みの本文は保持しない（順番待ちのページが溜まってもメモリが増えないように）
+                result.content = None
+                await done_queue.put((index, result, saunas))
+
+        num_fetchers = min(self.fetcher.max_concurrency, len(urls))
+        num_parsers = max(1, self.parse_workers)
+        tasks = [asyncio.create_task(fetch_stage()) for _ in range(num_fetchers)]
+        tasks += [asyncio.create_task(parse_stage()) for _ in range(num_parsers)]
+        try:
+            for _ in range(len(urls)):
+                yield await done_queue.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def iter_page_batches_async(self, start_page: int, num_pages: int = 1, keyword: str = "穴場") -> AsyncIterator[Tuple[int, List[SaunaBase]]]:
+        """
+        1ページ分ずつサウナ情報をページ順に返すジェネレーター
+
+        取得・解析は先読みして並行に行うが、呼び出し側にはページ順に渡すので、
+        そのまま保存していけば途中で止まっても続きのページから再開できる。
+        取得に失敗したページで終了し、それ以降のページは返さない。
+        304のページは空のリストを返す。
+
+        Yields:
+            (ページ番号, そのページのサウナ情報)
+        """
+        pages = list(range(start_page, start_page + num_pages))
+        logger.info(f"キーワード「{keyword}」のページ {start_page}〜{start_page + num_pages - 1} をスクレイピング開始")
+        urls = [self.generate_page_url(page, keyword) for page in pages]
+
+        # 先に届いたページは順番が来るまで保持する
+        buffered: Dict[int, Tuple[FetchResult, Optional[List[SaunaBase]]]] = {}
+        next_index = 0
+        async with aclosing(self.iter_fetch_and_parse(urls)) as stream:
+            async for index, result, saunas in stream:
+                buffered[index] = (result, saunas)
+                while next_index in buffered:
+                    result, saunas = buffered.pop(next_index)
+                    page = pages[next_index]
+                    if not result.ok:
+                        logger.error(f"ページ {page} のスクレイピングに失敗しました: {result.error}")
+                        return
+                    if result.not_modified:
+                        # 前回取得時から変更がないページは解析しない
+                        logger.info(f"ページ {page} は更新されていないためスキップします（304）")
+                    yield page, saunas or []
+                    next_index += 1
+
+    async def ingest_scheduled_scraping_async(
+        self,
+        db: AsyncSession,
+        config: KeywordConfig = DEFAULT_KEYWORD,
+        num_pages: int = 1
+    ) -> Dict:
+        """
+        前回の続きから指定ページ数分をスクレイピングし、1ページごとにDBへ保存する
+
+        各ページの保存と次回開始ページの更新は同じトランザクションでコミットするため、
+        全ページ分をメモリに溜めることはなく、失敗しても保存済みのページの次から再開できる。
+
+        Args:
+            db: 非同期データベースセッション
+            config: 対象キーワードの設定
+            num_pages: スクレイピングするページ数
+
+        Returns:
+            Dict: 保存件数・処理したページ数・次回の開始ページ・アーカイブへの書き込みエラー
+        """
+        start_page = await self.load_last_scraped_page_async(db, config.key_prefix)
+        logger.info(f"キーワード「{config.term}」のページ {start_page} からスクレイピングを開始")
+
+        count = 0
+        archive_errors: List[str] = []
+        next_page = start_page
+        async for page, saunas in self.iter_page_batches_async(start_page, num_pages, config.term):
+            saved = await crud.save_page_batch_async(db, config.slug, saunas, page + 1, config.key_prefix)
+            await self._archive_async(config.slug, saved, archive_errors)
+            count += len(saved)
+            next_page = page + 1
+
+        return {
+            "mode": "cursor",
+            "count": count,
+            "pages": next_page - start_page,
+            "next_page": next_page,
+            "archive_errors": archive_errors,
+        }
+
+    async def ingest_incremental_async(
+        self,
+        db: AsyncSession,
+        config: KeywordConfig = DEFAULT_KEYWORD,
+        max_pages: int = 10
+    ) -> Dict:
+        """
+        新着順に1ページ目から取得し、集計済みのレビューに到達した時点で終了する（差分クロール）
+
+        新しいレビューは1ページ目に追加されるため、前回以降の新着だけを少ないページ数で取り込める。
+        先読みはせず1ページずつ取得するので、新着が無ければ1ページ（304なら本文の転送もなし）で終わる。
+        ページカーソルは使わない・更新しないため、深いページの取り込みは
+        ingest_scheduled_scraping_async（カーソル方式）で行う。
+        レビューIDが取れないカードは数えず、1件もIDが取れないページでは終了する（終了理由 "no_review_ids"）。
+        IDが無いと集計済みのレビューに到達したことが分からず、定期実行のたびに同じレビューを数え直すため。
+
+        Args:
+            db: 非同期データベースセッション
+            config: 対象キーワードの設定
+            max_pages: 集計済みのレビューが見つからない場合に取得する最大ページ数
+
+        Returns:
+            Dict: 保存件数・取得したページ数・終了理由・アーカイブへの書き込みエラー
+        """
+        logger.info(f"キーワード「{config.term}」の差分クロールを開始")
+
+        count = 0
+        archive_errors: List[str] = []
+        pages = 0
+        stop_reason = "max_pages"
+        for page in range(1, max_pages + 1):
+            url = self.generate_page_url(page, config.term)
+            result = await self._fetch_with_retry(url)
+            pages += 1
+            if not result.ok:
+                logger.error(f"ページ {page} のスクレイピングに失敗しました: {result.error}")
+                stop_reason = "error"
+                break
+            if result.not_modified:
+                # 前回取得時から変更がなければ新着レビューも無い
+                stop_reason = "not_modified"
                 break
 
-        return all_saunas
+            saunas = await self._parse_in_worker(result.content)
+            if not saunas:
+                stop_reason = "empty"
+                break
 
-    def run_scheduled_scraping(self, db: Session, num_pages: int = 1, keyword: str = "穴場", key_prefix: str = "last_page") -> List[SaunaBase]:
-        """前回の続きから指定ページ数分のスクレイピングを実行"""
-        # 前回の続きのページをDBから読み込む
-        start_page = self.load_last_scraped_page(db, key_prefix)
-        logger.info(f"キーワード「{keyword}」のページ {start_page} からスクレイピングを開始")
+            # レビューIDの無いカードは集計済みかどうか判定できず、毎回数え直すことになるので数えない
+            identified = [sauna for sauna in saunas if sauna.review_id]
+            if len(identified) < len(saunas):
+                logger.warning(
+                    f"ページ {page} の{len(saunas) - len(identified)}件のレビューはIDが取れないため数えません"
+                    "（投稿へのリンクのセレクタを確認してください）"
+                )
+            if not identified:
+                stop_reason = "no_review_ids"
+                break
 
-        # スクレイピングを実行
-        saunas = self.scrape_multiple_pages(start_page, num_pages, keyword)
+            saved, reached_seen = await crud.save_incremental_page_async(db, config.slug, identified)
+            await self._archive_async(config.slug, saved, archive_errors)
+            count += len(saved)
+            if reached_seen:
+                stop_reason = "reached_seen"
+                break
+
+        logger.info(f"キーワード「{config.term}」の差分クロールが終了しました（{pages}ページ, 終了理由: {stop_reason}）")
+        return {
+            "mode": "incremental",
+            "count": count,
+            "pages": pages,
+            "stop_reason": stop_reason,
+            "archive_errors": archive_errors,
+        }
+
+    async def ingest_crawl_plan_async(self, db: AsyncSession, units: List[CrawlUnit], num_pages: int = 1) -> Dict:
+        """
+        キーワード×都道府県の各単位について、ページカーソルの続きから指定ページ数分を取り込む
+
+        全単位の全ページを1つのパイプラインに流すため、取得は共有のAsyncFetcherの
+        同時接続数・レート制限の範囲で並行に行われ、所要時間は単位数ではなくレート制限で決まる。
+        保存は単位ごとにページ順で行い、ページの保存とその単位のカーソル
+        （ScrapingStateの f"{key_prefix}:{都道府県}"）の更新は同じトランザクションでコミットする。
+        取得に失敗した単位はそこで打ち切り、次回はそのページから再開する。
+
+        Args:
+            db: 非同期データベースセッション
+            units: クロールする単位（build_crawl_planで作成）
+            num_pages: 各単位で取得するページ数
+
+        Returns:
+            Dict: 単位数・保存件数・保存したページ数・失敗した単位・アーカイブへの書き込みエラー
+        """
+        start_pages = await crud.get_scraping_state_values_async(db, [unit.cursor_key for unit in units])
+        next_pages = {unit: start_pages.get(unit.cursor_key, 1) for unit in units}
+
+        # 各単位の1ページ目を先に取得するように、ページ→単位の順に並べる
+        work = [
+            (unit, next_pages[unit] + offset)
+            for offset in range(num_pages)
+            for unit in units
+        ]
+        urls = [self.generate_page_url(page, unit.config.term, unit.prefecture) for unit, page in work]
+        logger.info(f"クロール計画を開始: {len(units)}単位 × {num_pages}ページ（{len(urls)}リクエスト）")
+
+        buffered: Dict[CrawlUnit, Dict[int, Tuple[FetchResult, Optional[List[SaunaBase]]]]] = defaultdict(dict)
+        failed: Dict[CrawlUnit, str] = {}
+        count = 0
+        archive_errors: List[str] = []
+        saved_pages = 0
+
+        def skip_failed(index: int) -> bool:
+            # 失敗した単位の残りのページは取得しない
+            return work[index][0] in failed
+
+        async with aclosing(self.iter_fetch_and_parse(urls, skip_failed)) as stream:
+            async for index, result, saunas in stream:
+                unit, page = work[index]
+                if unit in failed:
+                    continue
+                buffered[unit][page] = (result, saunas)
+                # 届いたページから順に、その単位の次のページが揃っている分だけ保存する
+                while next_pages[unit] in buffered[unit]:
+                    result, saunas = buffered[unit].pop(next_pages[unit])
+                    if not result.ok:
+                        error = str(result.error or f"HTTP {result.status_code}")
+                        logger.error(f"{unit.label} のページ {next_pages[unit]} のスクレイピングに失敗しました: {error}")
+                        failed[unit] = error
+                        buffered.pop(unit, None)
+                        break
+                    saved = await crud.save_page_batch_async(
+                        db, unit.config.slug, saunas or [], next_pages[unit] + 1, unit.cursor_key
+                    )
+                    await self._archive_async(unit.config.slug, saved, archive_errors)
+                    count += len(saved)
+                    saved_pages += 1
+                    next_pages[unit] += 1
 
-        # 次回の開始ページを保存
-        next_start_page = start_page + num_pages
-        self.save_last_scraped_page(db, next_start_page, key_prefix)
+        return {
+            "mode": "plan",
+            "units": len(units),
+            "count": count,
+            "pages": saved_pages,
+            "failed_units": {unit.label: error for unit, error in failed.items()},
+            "archive_errors": archive_errors,
+        }
 
-        return saunas
\ No newline at end of file
+    async def aclose(self) -> None:
+        """フェッチャーの接続と解析用のプロセスプールを閉じる"""
+        await self.fetcher.aclose()
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
\ No newline at end of file
@@ -53,18 +53,34 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data(ttl=600)  # 10分間キャッシュ
+@st.cache_resource
+def get_etag_store():
+    """エンドポイントごとのETagと前回のレスポンスを保持する（再実行をまたいで共有）"""
+    return {}
+
+@st.cache_data(ttl=60)  # 1分間キャッシュ（期限切れ後はETagで再検証）
 def get_sauna_ranking(endpoint="/api/ranking"):
     """FastAPIエンドポイントからランキングデータを取得"""
     try:
         # 現在のホストの同じポートにリクエスト
         url = f"{API_BASE_URL}{endpoint}"
         st.sidebar.info(f"Requesting: {url}")
-        response = requests.get(url)
-        response.raise_for_status()
+
+        # 前回のETagを送り、変更がなければ（304）前回のデータを使う
+        etag_store = get_etag_store()
+        previous = etag_store.get(url)
+        headers = {"If-None-Match": previous["etag"]} if previous else {}
+        response = requests.get(url, headers=headers)
+        if response.status_code == 304 and previous:
+            data = previous["data"]
+        else:
+            response.raise_for_status()
+            data = response.json()
+            if response.headers.get("ETag"):
+                etag_store[url] = {"etag": response.headers["ETag"], "data": data}
         
         # JSONデータをDataFrameに変換
-        df = pd.DataFrame(response.json())
+        df = pd.DataFrame(data)
         
         if df.empty:
             return df
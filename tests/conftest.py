@@ -0,0 +1,32 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from models.database import Base
+
+# database.db はインポート時にエンジンを作るので、PostgreSQLのドライバが無くても読み込めるようにする
+# （テストは下のrun_with_dbで作るSQLiteだけを使い、本番のDBには接続しない）
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+
+@pytest.fixture
+def run_with_db(tmp_path):
+    """テーブルを作ったSQLiteの非同期セッションで、シナリオ（async def scenario(db)）を実行する"""
+
+    def run(scenario):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                    return await scenario(db)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
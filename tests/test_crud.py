@@ -0,0 +1,234 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import crud
+from models.database import FacilityDB, KeywordCountDB, KeywordDailyCountDB, KeywordWindowCountDB
+from models.sauna import SaunaBase
+
+BASE_URL = "https://sauna-ikitai.com"
+
+
+def sauna(facility: int, review_id, name: str = None) -> SaunaBase:
+    return SaunaBase(
+        name=name or f"サウナ{facility}",
+        url=f"{BASE_URL}/saunas/{facility}",
+        review_count=1,
+        last_updated=datetime(2026, 1, 1, 12, 0),
+        review_id=review_id,
+    )
+
+
+async def insert_rows(db, model, rows):
+    await db.execute(model.__table__.insert(), rows)
+    await db.commit()
+
+
+async def insert_facilities(db, ids):
+    await insert_rows(db, FacilityDB, [{"id": i, "name": f"サウナ{i}", "url": f"{BASE_URL}/saunas/{i}"} for i in ids])
+
+
+async def keyword_totals(db, keyword="anaba"):
+    rows = await db.execute(
+        select(FacilityDB.url, KeywordCountDB.review_count)
+        .join(FacilityDB, FacilityDB.id == KeywordCountDB.facility_id)
+        .where(KeywordCountDB.keyword == keyword)
+    )
+    return dict(rows.all())
+
+
+async def window_counts(db, keyword="anaba"):
+    """期間 → {施設ID: レビュー数}（ランキングに出る行だけ）"""
+    return {
+        window_days: {row.id: row.review_count for row in await crud.get_window_ranking_async(db, keyword, window_days, 100)}
+        for window_days in crud.RANKING_WINDOWS_DAYS
+    }
+
+
+# ---- 集計済みレビューの除外 ----
+
+def test_recrawling_seen_reviews_counts_nothing(run_with_db):
+    page = [sauna(1, "101"), sauna(1, "102"), sauna(2, "103")]
+
+    async def scenario(db):
+        first = await crud.upsert_keyword_counts_async(db, "anaba", page)
+        second = await crud.upsert_keyword_counts_async(db, "anaba", page)
+        return first, second, await keyword_totals(db), await window_counts(db)
+
+    first, second, totals, windows = run_with_db(scenario)
+
+    assert sorted(row["review_count"] for row in first) == [1, 2]
+    assert second == []
+    assert totals == {f"{BASE_URL}/saunas/1": 2, f"{BASE_URL}/saunas/2": 1}
+    assert all(counts == {1: 2, 2: 1} for counts in windows.values())
+
+
+def test_recrawl_counts_only_new_and_unidentified_reviews(run_with_db):
+    async def scenario(db):
+        await crud.upsert_keyword_counts_async(db, "anaba", [sauna(1, "101"), sauna(2, "102")])
+        # 101は集計済み、104は新着、IDの無いカードは重複を判定できないので数える
+        saved = await crud.upsert_keyword_counts_async(db, "anaba", [sauna(1, "101"), sauna(1, "104"), sauna(2, None)])
+        # 同じレビューでも別のキーワードでは数える
+        await crud.upsert_keyword_counts_async(db, "kashikiri", [sauna(1, "101")])
+        return saved, await keyword_totals(db), await keyword_totals(db, "kashikiri")
+
+    saved, totals, other = run_with_db(scenario)
+
+    assert sorted((row["url"], row["review_count"]) for row in saved) == [
+        (f"{BASE_URL}/saunas/1", 1),
+        (f"{BASE_URL}/saunas/2", 1),
+    ]
+    assert totals == {f"{BASE_URL}/saunas/1": 2, f"{BASE_URL}/saunas/2": 2}
+    assert other == {f"{BASE_URL}/saunas/1": 1}
+
+
+# ---- 直近N日間のロールアップ ----
+
+def test_expire_window_day_statements_subtracts_only_that_day(run_with_db):
+    day = date(2026, 3, 1)
+    later = day + timedelta(days=2)
+
+    async def scenario(db):
+        await insert_facilities(db, [1, 2])
+        await insert_rows(db, KeywordDailyCountDB, [
+            {"keyword": "anaba", "facility_id": 1, "day": day, "review_count": 3},
+            {"keyword": "anaba", "facility_id": 1, "day": later, "review_count": 2},
+            {"keyword": "anaba", "facility_id": 2, "day": later, "review_count": 4},
+            {"keyword": "kashikiri", "facility_id": 2, "day": day, "review_count": 1},
+        ])
+        await insert_rows(db, KeywordWindowCountDB, [
+            {"keyword": keyword, "window_days": window_days, "facility_id": facility_id, "review_count": count}
+            for keyword, facility_id, count in [("anaba", 1, 5), ("anaba", 2, 4), ("kashikiri", 2, 1)]
+            for window_days in (7, 30)
+        ])
+
+        results = []
+        for expired_day in (day, later):
+            for stmt in crud._expire_window_day_statements(7, expired_day):
+                await db.execute(stmt)
+            await db.commit()
+            rows = await db.execute(select(
+                KeywordWindowCountDB.keyword,
+                KeywordWindowCountDB.window_days,
+                KeywordWindowCountDB.facility_id,
+                KeywordWindowCountDB.review_count,
+            ))
+            results.append(sorted(rows.all()))
+        return results
+
+    after_day, after_later = run_with_db(scenario)
+
+    assert after_day == [
+        ("anaba", 7, 1, 2),
+        ("anaba", 7, 2, 4),
+        ("anaba", 30, 1, 5),
+        ("anaba", 30, 2, 4),
+        ("kashikiri", 30, 2, 1),
+    ]
+    # 0になった行は削除され、30日間の行はそのまま
+    assert after_later == [
+        ("anaba", 30, 1, 5),
+        ("anaba", 30, 2, 4),
+        ("kashikiri", 30, 2, 1),
+    ]
+
+
+def test_roll_window_counts_drops_day_at_each_window_edge(run_with_db):
+    today = date.today()
+
+    async def roll(db, days):
+        rolled = await crud.roll_window_counts_async(db, today + timedelta(days=days))
+        daily_rows = await db.scalar(select(func.count()).select_from(KeywordDailyCountDB))
+        return rolled, await window_counts(db), daily_rows
+
+    async def scenario(db):
+        # 初回は今日を起点にするだけで何も差し引かない
+        results = [await roll(db, 0)]
+        await crud.upsert_keyword_counts_async(db, "anaba", [sauna(1, "101"), sauna(1, "102")])
+        for days in (6, 7, 7, 29, 30, 89, 90):
+            results.append(await roll(db, days))
+        return results, await keyword_totals(db)
+
+    results, totals = run_with_db(scenario)
+
+    assert results == [
+        (0, {7: {}, 30: {}, 90: {}}, 0),
+        (6 * 3, {7: {1: 2}, 30: {1: 2}, 90: {1: 2}}, 1),
+        (3, {7: {}, 30: {1: 2}, 90: {1: 2}}, 1),
+        (0, {7: {}, 30: {1: 2}, 90: {1: 2}}, 1),  # 同じ日に2回進めても差し引かない
+        (22 * 3, {7: {}, 30: {1: 2}, 90: {1: 2}}, 1),
+        (3, {7: {}, 30: {}, 90: {1: 2}}, 1),
+        (59 * 3, {7: {}, 30: {}, 90: {1: 2}}, 1),
+        (3, {7: {}, 30: {}, 90: {}}, 0),  # 最長の期間より古い日別の増分は削除する
+    ]
+    assert totals == {f"{BASE_URL}/saunas/1": 2}
+
+
+def test_roll_window_counts_expires_every_skipped_day(run_with_db):
+    today = date.today()
+
+    async def scenario(db):
+        await crud.roll_window_counts_async(db, today)
+        await crud.upsert_keyword_counts_async(db, "anaba", [sauna(1, "101"), sauna(2, "102")])
+        # 何日も止まっていた場合も、その間に期間外になった日をまとめて差し引く
+        rolled = await crud.roll_window_counts_async(db, today + timedelta(days=10))
+        return rolled, await window_counts(db)
+
+    rolled, windows = run_with_db(scenario)
+
+    assert rolled == 10 * 3
+    assert windows == {7: {}, 30: {1: 1, 2: 1}, 90: {1: 1, 2: 1}}
+
+
+# ---- キーセットページング ----
+
+def test_window_ranking_pages_follow_review_count_then_facility_id(run_with_db):
+    counts = {1: 3, 2: 5, 3: 3, 4: 1, 5: 3}
+
+    async def scenario(db):
+        await insert_facilities(db, counts)
+        await insert_rows(db, KeywordWindowCountDB, [
+            {"keyword": "anaba", "window_days": 7, "facility_id": facility_id, "review_count": count}
+            for facility_id, count in counts.items()
+        ] + [
+            {"keyword": "anaba", "window_days": 30, "facility_id": 6, "review_count": 9},
+            {"keyword": "kashikiri", "window_days": 7, "facility_id": 1, "review_count": 9},
+        ])
+        pages, after = [], None
+        while True:
+            page = await crud.get_window_ranking_async(db, "anaba", 7, 2, after)
+            if not page:
+                return pages
+            pages.append([row.id for row in page])
+            after = (page[-1].review_count, page[-1].id)
+
+    assert run_with_db(scenario) == [[2, 1], [3, 5], [4]]
+
+
+def test_window_ranking_rejects_unknown_window(run_with_db):
+    async def scenario(db):
+        await crud.get_window_ranking_async(db, "anaba", 14)
+
+    with pytest.raises(ValueError):
+        run_with_db(scenario)
+
+
+def test_snapshot_ranking_pages_by_rank(run_with_db):
+    page = [sauna(1, "101"), sauna(2, "102"), sauna(2, "103"), sauna(3, "104"), sauna(3, "105"), sauna(3, "106")]
+
+    async def scenario(db):
+        await crud.upsert_keyword_counts_async(db, "anaba", page)
+        await crud.refresh_ranking_snapshot_async(db, "anaba")
+        pages, after_rank = [], None
+        while True:
+            rows = await crud.get_snapshot_ranking_async(db, "anaba", 2, after_rank)
+            if not rows:
+                return pages
+            pages.append([(row.rank, row.url, row.review_count) for row in rows])
+            after_rank = rows[-1].rank
+
+    assert run_with_db(scenario) == [
+        [(1, f"{BASE_URL}/saunas/3", 3), (2, f"{BASE_URL}/saunas/2", 2)],
+        [(3, f"{BASE_URL}/saunas/1", 1)],
+    ]
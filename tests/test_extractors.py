@@ -0,0 +1,90 @@
+from bs4 import BeautifulSoup
+import pytest
+
+from services.extractors import (
+    FACILITY_LINK_SELECTOR,
+    POST_CARD_CLASS,
+    POST_LINK_SELECTOR,
+    LxmlReviewExtractor,
+    SoupReviewExtractor,
+    build_sauna,
+    extract_review_count,
+    extract_review_id,
+)
+
+BASE_URL = "https://sauna-ikitai.com"
+
+# 複数クラスのカード・入れ子のカード・施設リンクの無いカード・似た名前のクラスを含むページ
+PAGE = """
+<html><body>
+<div class="p-postCard">
+  <a href="/posts/101">p</a>
+  <div class="p-postCard_facility"><a href="/saunas/1">サウナA</a></div>
+</div>
+<div class="p-postCard foo">
+  <a href="/posts/102">p</a>
+  <div class="p-postCard_facility"><a href="https://sauna-ikitai.com/saunas/2"> サウナB </a></div>
+</div>
+<div class="bar  p-postCard
+  baz">
+  <div class="p-postCard_facility"><a href="/saunas/3">サウナC</a></div>
+</div>
+<section class="wrapper">
+  <div class="p-postCard outer">
+    <a href="/posts/104">p</a>
+    <div class="p-postCard_facility"><a href="/saunas/4">サウナD</a></div>
+    <div class="p-postCard inner">
+      <a href="/posts/105">p</a>
+      <div class="p-postCard_facility"><a href="/saunas/5">サウナE</a></div>
+    </div>
+  </div>
+</section>
+<div class="p-postCard"><a href="/posts/106">施設リンクなし</a></div>
+<div class="p-postCardList"><div class="p-postCard_facility"><a href="/saunas/9">対象外</a></div></div>
+</body></html>
+""".encode()
+
+
+def baseline_extract(content: bytes):
+    """部分解析を導入する前の抽出（ページ全体を解析して .p-postCard を選択する）"""
+    soup = BeautifulSoup(content, "html.parser")
+    saunas = []
+    for item in soup.select(f".{POST_CARD_CLASS}"):
+        link = item.select_one(FACILITY_LINK_SELECTOR)
+        if link:
+            post_link = item.select_one(POST_LINK_SELECTOR)
+            review_id = extract_review_id(post_link.get("href")) if post_link else None
+            saunas.append(build_sauna(link.text, link.get("href"), BASE_URL, review_id))
+    return saunas
+
+
+def summarize(saunas):
+    return [(sauna.name, sauna.url, sauna.review_count, sauna.review_id) for sauna in saunas]
+
+
+@pytest.mark.parametrize(
+    "extractor",
+    [SoupReviewExtractor("html.parser"), SoupReviewExtractor("lxml"), LxmlReviewExtractor()],
+    ids=["soup-html.parser", "soup-lxml", "lxml"],
+)
+def test_extractors_match_baseline(extractor):
+    expected = summarize(baseline_extract(PAGE))
+    assert [name for name, *_ in expected] == ["サウナA", "サウナB", "サウナC", "サウナD", "サウナE"]
+    assert summarize(extractor.extract(PAGE, BASE_URL)) == expected
+
+
+# 実際の詳細ページの構造ではなく、セレクタの適用と数字の取り出しを確認するための最小のHTML
+DETAIL_PAGE = """
+<html><body>
+<div class="p-saunaDetail"><span class="p-saunaDetail_ikitaiCount">1,234 サ活</span></div>
+</body></html>
+""".encode()
+
+
+def test_extract_review_count_is_disabled_without_selector():
+    assert extract_review_count(DETAIL_PAGE, selector="") is None
+
+
+def test_extract_review_count_reads_digits_from_configured_selector():
+    assert extract_review_count(DETAIL_PAGE, selector=".p-saunaDetail_ikitaiCount") == 1234
+    assert extract_review_count(DETAIL_PAGE, selector=".missing") is None
@@ -0,0 +1,65 @@
+import asyncio
+
+from services.ranking_cache import RankingCache
+
+
+def test_set_evicts_oldest_entry_when_full():
+    cache = RankingCache(ttl_seconds=300, max_entries=2)
+    cache.set("anaba", 10, b"[1]")
+    cache.set("anaba", 20, b"[2]")
+    cache.set("anaba", 30, b"[3]")
+
+    assert cache.get("anaba", 10) is None
+    assert cache.get("anaba", 20).payload == b"[2]"
+    assert cache.get("anaba", 30).payload == b"[3]"
+
+
+def test_set_refreshes_existing_entry_instead_of_evicting():
+    cache = RankingCache(ttl_seconds=300, max_entries=2)
+    cache.set("anaba", 10, b"[1]")
+    cache.set("anaba", 20, b"[2]")
+    # 作り直したエントリは最新になるので、次に破棄されるのは20件のエントリ
+    cache.set("anaba", 10, b"[1']")
+    cache.set("kashikiri", 10, b"[3]")
+
+    assert cache.get("anaba", 10).payload == b"[1']"
+    assert cache.get("anaba", 20) is None
+    assert cache.get("kashikiri", 10).payload == b"[3]"
+
+
+def test_set_drops_expired_entries_before_live_ones():
+    cache = RankingCache(ttl_seconds=300, max_entries=2)
+    cache.set("anaba", 10, b"[1]")
+    cache.ttl_seconds = -1
+    cache.set("anaba", 20, b"[2]")  # 作成時点で失効済み
+    cache.ttl_seconds = 300
+    cache.set("anaba", 30, b"[3]")
+
+    assert cache.get("anaba", 10).payload == b"[1]"
+    assert cache.get("anaba", 30).payload == b"[3]"
+
+
+def test_get_or_load_async_does_not_store_ranking_invalidated_while_loading():
+    cache = RankingCache(ttl_seconds=300)
+
+    async def load_then_commit():
+        # 読み込み中に取り込みがコミットされ、invalidateされた
+        cache.invalidate("anaba")
+        return b"[stale]", None
+
+    cached = asyncio.run(cache.get_or_load_async("anaba", 10, load_then_commit))
+
+    assert cached.payload == b"[stale]"
+    assert cache.get("anaba", 10) is None
+
+
+def test_invalidating_other_keyword_does_not_skip_store():
+    cache = RankingCache(ttl_seconds=300)
+
+    def load():
+        cache.invalidate("kashikiri")
+        return b"[1]", None
+
+    cache.get_or_load("anaba", 10, load)
+
+    assert cache.get("anaba", 10).payload == b"[1]"
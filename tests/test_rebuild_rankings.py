@@ -0,0 +1,113 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+import crud
+from models.database import FacilityDB, KeywordCountDB, KeywordDailyCountDB, KeywordWindowCountDB
+from models.sauna import SaunaBase
+from rebuild_rankings import aggregate_archive
+from services.archive import CrawlArchive, load_archive
+
+BASE_URL = "https://sauna-ikitai.com"
+
+
+def sauna(facility: int, review_id: str, name: str = None) -> SaunaBase:
+    return SaunaBase(
+        name=name or f"サウナ{facility}",
+        url=f"{BASE_URL}/saunas/{facility}",
+        review_count=1,
+        last_updated=datetime(2026, 1, 1, 12, 0),
+        review_id=review_id,
+    )
+
+
+def aggregated_counts(aggregated):
+    """aggregate_archiveの結果を、DBと比べられる (keyword, url[, 日・期間]) → レビュー数 の辞書にする"""
+    totals, daily, windows = {}, {}, {}
+    for keyword, batch in aggregated.items():
+        totals.update({(keyword, row["url"]): row["review_count"] for row in batch["rows"]})
+        daily.update({(keyword, row["url"], row["day"]): row["review_count"] for row in batch["daily_rows"]})
+        windows.update({(keyword, row["url"], row["window_days"]): row["review_count"] for row in batch["window_rows"]})
+    return totals, daily, windows
+
+
+async def db_counts(db):
+    totals = await db.execute(
+        select(KeywordCountDB.keyword, FacilityDB.url, KeywordCountDB.review_count)
+        .join(FacilityDB, FacilityDB.id == KeywordCountDB.facility_id)
+    )
+    daily = await db.execute(
+        select(KeywordDailyCountDB.keyword, FacilityDB.url, KeywordDailyCountDB.day, KeywordDailyCountDB.review_count)
+        .join(FacilityDB, FacilityDB.id == KeywordDailyCountDB.facility_id)
+    )
+    windows = await db.execute(
+        select(KeywordWindowCountDB.keyword, FacilityDB.url, KeywordWindowCountDB.window_days, KeywordWindowCountDB.review_count)
+        .join(FacilityDB, FacilityDB.id == KeywordWindowCountDB.facility_id)
+    )
+    return tuple({tuple(row[:-1]): row[-1] for row in result} for result in (totals, daily, windows))
+
+
+def test_aggregate_archive_matches_live_ingest(run_with_db, tmp_path):
+    archive = CrawlArchive(str(tmp_path / "archive"))
+    today = date.today()
+    pages = [
+        ("anaba", [sauna(1, "101"), sauna(1, "102"), sauna(2, "103")]),
+        # 再クロール（集計済みの101・103は数えず、アーカイブにも書かない）
+        ("anaba", [sauna(1, "101"), sauna(2, "103"), sauna(2, "104", name="サウナ2（改名）"), sauna(3, None)]),
+        ("anaba", [sauna(1, "101")]),
+        ("kashikiri", [sauna(1, "101"), sauna(3, "105")]),
+    ]
+
+    async def scenario(db):
+        await crud.roll_window_counts_async(db, today)
+        for keyword, saunas in pages:
+            rows = await crud.upsert_keyword_counts_async(db, keyword, saunas)
+            archive.append(keyword, rows)
+        return await db_counts(db)
+
+    live = run_with_db(scenario)
+    aggregated = aggregate_archive(
+        load_archive(str(tmp_path / "archive")),
+        {window_days: today for window_days in crud.RANKING_WINDOWS_DAYS},
+        today,
+    )
+
+    assert aggregated_counts(aggregated) == live
+    assert live[0] == {
+        ("anaba", f"{BASE_URL}/saunas/1"): 2,
+        ("anaba", f"{BASE_URL}/saunas/2"): 2,
+        ("anaba", f"{BASE_URL}/saunas/3"): 1,
+        ("kashikiri", f"{BASE_URL}/saunas/1"): 1,
+        ("kashikiri", f"{BASE_URL}/saunas/3"): 1,
+    }
+    names = {row["url"]: row["name"] for row in aggregated["anaba"]["rows"]}
+    assert names[f"{BASE_URL}/saunas/2"] == "サウナ2（改名）"
+
+
+def test_aggregate_archive_windows_follow_rollup_day(tmp_path):
+    archive = CrawlArchive(str(tmp_path / "archive"))
+    today = date(2026, 6, 30)
+    rolled_to = today - timedelta(days=1)
+    for days_ago, count in [(0, 1), (7, 2), (10, 4), (100, 8)]:
+        crawled_at = datetime.combine(today - timedelta(days=days_ago), datetime.min.time())
+        archive.append("anaba", [{
+            "facility_id": 1,
+            "name": "サウナ1",
+            "url": f"{BASE_URL}/saunas/1",
+            "review_count": count,
+            "last_updated": crawled_at,
+        }], crawled_at=crawled_at)
+
+    # 7日間のロールアップだけ昨日で止まっている（7日前の分はまだ差し引かれていない）
+    aggregated = aggregate_archive(
+        load_archive(str(tmp_path / "archive")),
+        {7: rolled_to, 30: today, 90: today},
+        today,
+    )
+    totals, daily, windows = aggregated_counts(aggregated)
+    url = f"{BASE_URL}/saunas/1"
+
+    assert totals == {("anaba", url): 15}
+    assert windows == {("anaba", url, 7): 1 + 2, ("anaba", url, 30): 1 + 2 + 4, ("anaba", url, 90): 1 + 2 + 4}
+    # 最長の期間より古い日別の増分は残さない
+    assert sorted(day for _, _, day in daily) == [today - timedelta(days=10), today - timedelta(days=7), today]
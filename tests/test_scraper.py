@@ -0,0 +1,35 @@
+from services.scraper import SaunaScraper
+
+
+def test_options_are_read_from_env_at_construction(monkeypatch):
+    # モジュールをインポートした後に設定した環境変数も反映される
+    monkeypatch.setenv("SCRAPER_POOL_SIZE", "3")
+    monkeypatch.setenv("SCRAPER_MAX_CONCURRENCY", "2")
+    monkeypatch.setenv("SCRAPER_RPS", "0.5")
+    monkeypatch.setenv("SCRAPER_BURST", "5")
+    monkeypatch.setenv("SCRAPER_CONNECT_TIMEOUT", "1.5")
+    monkeypatch.setenv("SCRAPER_READ_TIMEOUT", "7")
+    monkeypatch.setenv("DETAIL_TTL_HOURS", "2")
+
+    scraper = SaunaScraper(cache_dir="", archive_dir="")
+
+    assert scraper.pool_size == 3
+    assert scraper.fetcher.pool_size == 3
+    assert scraper.fetcher.max_concurrency == 2
+    assert scraper.fetcher.requests_per_second == 0.5
+    assert scraper.fetcher.burst == 5
+    assert scraper.fetcher.timeout.connect == 1.5
+    assert scraper.fetcher.timeout.read == 7.0
+    assert scraper.detail_ttl_seconds == 2 * 3600
+
+
+def test_arguments_take_precedence_over_env(monkeypatch):
+    monkeypatch.setenv("SCRAPER_POOL_SIZE", "3")
+    monkeypatch.setenv("SCRAPER_CACHE_DIR", "/nonexistent")
+
+    # 空文字は「無効」の指定なので、環境変数で上書きしない
+    scraper = SaunaScraper(pool_size=6, cache_dir="", archive_dir="")
+
+    assert scraper.pool_size == 6
+    assert scraper.cache is None
+    assert scraper.archive is None